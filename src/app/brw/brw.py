@@ -86,3 +86,11 @@ class G2GBrowser(Browser):
         logger.info("Waiting for login")
         await self.waiting_for_login(sleep_interval)
         return await self.get_access_token_in_safe(sleep_interval)
+
+    async def refresh_access_token(
+        self,
+        sleep_interval: int = 10,
+    ) -> str:
+        await self.page.refresh()
+        await asyncio.sleep(5)
+        return await self.get_access_token_in_safe(sleep_interval)
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime
+
+from ..logger import logger
+from .exceptions import NoTokenError
+from .models import JWTPayload
+from .token_provider import FileTokenProvider, TokenProvider
+from .utils import decode_jwt
+
+MIN_REFRESH_DELAY: float = 30
+
+
+class TokenManager:
+    """Keep the G2G access token and its decoded payload in memory.
+
+    Callers get the cached token without a browser round-trip. A background
+    task refreshes it `refresh_margin` seconds before it expires. Providers
+    are asked in order, so a cached token is used before the browser starts,
+    and every new token is saved to `token_store`.
+    """
+
+    def __init__(
+        self,
+        providers: list[TokenProvider],
+        refresh_margin: float,
+        token_store: FileTokenProvider | None = None,
+    ) -> None:
+        self.providers = providers
+        self.refresh_margin = refresh_margin
+        self.token_store = token_store
+        self.token: str | None = None
+        self.payload: JWTPayload | None = None
+        self.lock = asyncio.Lock()
+        self.refresh_task: asyncio.Task | None = None
+
+    def seconds_to_expiry(self) -> float:
+        if self.payload is None:
+            return 0
+        return self.payload.exp - datetime.now().timestamp()
+
+    async def get_token(self) -> str:
+        if self.token is None or self.seconds_to_expiry() <= 0:
+            await self.refresh()
+        assert self.token
+        return self.token
+
+    async def get_payload(self) -> JWTPayload:
+        await self.get_token()
+        assert self.payload
+        return self.payload
+
+    async def refresh(self, force: bool = False) -> None:
+        async with self.lock:
+            now = datetime.now().timestamp()
+            if self.token is None or self.seconds_to_expiry() <= 0:
+                min_valid_until = now + MIN_REFRESH_DELAY
+            elif force:
+                min_valid_until = now + self.refresh_margin
+            else:
+                return
+
+            for provider in self.providers:
+                token = await provider.get_token(min_valid_until)
+                if token is not None:
+                    break
+            else:
+                raise NoTokenError(
+                    f"No provider has a G2G token valid until "
+                    f"{datetime.fromtimestamp(min_valid_until)}"
+                )
+
+            self.token = token
+            self.payload = decode_jwt(token)
+            if self.token_store is not None:
+                self.token_store.save(token)
+            logger.info(
+                f"Token from {provider.name} expired at: "
+                f"{datetime.fromtimestamp(self.payload.exp)}"
+            )
+
+    async def run_refresh_loop(self) -> None:
+        while True:
+            delay = max(
+                self.seconds_to_expiry() - self.refresh_margin, MIN_REFRESH_DELAY
+            )
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh(force=True)
+            except Exception as e:
+                logger.exception(e)
+
+    async def start(self) -> None:
+        await self.refresh()
+        if self.refresh_task is None:
+            self.refresh_task = asyncio.create_task(self.run_refresh_loop())
+
+    async def stop(self) -> None:
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
+            try:
+                await self.refresh_task
+            except asyncio.CancelledError:
+                pass
+            self.refresh_task = None
+
+        for provider in self.providers:
+            await provider.close()
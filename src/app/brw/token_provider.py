@@ -0,0 +1,117 @@
+import base64
+import json
+import os
+from abc import ABC, abstractmethod
+from contextlib import AsyncExitStack
+from datetime import datetime
+from pathlib import Path
+
+from pydoll.browser.options import Options
+
+from ..logger import logger
+from .brw import G2GBrowser
+from .utils import decode_jwt
+
+
+class TokenProvider(ABC):
+    """Source of G2G access tokens for the TokenManager."""
+
+    name: str = "token"
+
+    @abstractmethod
+    async def get_token(self, min_valid_until: float) -> str | None:
+        """Return a token valid until at least `min_valid_until`, or None."""
+
+    async def close(self) -> None:
+        pass
+
+
+def is_valid_until(token: str, min_valid_until: float) -> bool:
+    try:
+        return decode_jwt(token).exp >= min_valid_until
+    except ValueError:
+        return False
+
+
+class FileTokenProvider(TokenProvider):
+    """Reuse a cached token from an env value or a file, never refreshes it."""
+
+    name = "file"
+
+    def __init__(self, file_path: Path | None, env_token: str | None = None) -> None:
+        self.file_path = file_path
+        self.env_token = env_token
+
+    async def get_token(self, min_valid_until: float) -> str | None:
+        tokens = [self.env_token]
+        if self.file_path is not None and self.file_path.exists():
+            tokens.append(self.file_path.read_text(encoding="utf-8").strip())
+
+        for token in tokens:
+            if token and is_valid_until(token, min_valid_until):
+                return token
+        return None
+
+    def save(self, token: str) -> None:
+        if self.file_path is None:
+            return
+
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.file_path.with_suffix(f"{self.file_path.suffix}.tmp")
+        tmp_path.write_text(token, encoding="utf-8")
+        os.replace(tmp_path, self.file_path)
+
+
+class BrowserTokenProvider(TokenProvider):
+    """Read the token from a logged in g2g.com page, Chrome starts on first use."""
+
+    name = "browser"
+
+    def __init__(self, options: Options | None = None) -> None:
+        self.options = options
+        self.brw: G2GBrowser | None = None
+        self.exit_stack = AsyncExitStack()
+
+    async def browser(self) -> G2GBrowser:
+        if self.brw is None:
+            logger.info("Start browser for G2G token")
+            self.brw = await self.exit_stack.enter_async_context(
+                G2GBrowser.init(self.options)
+            )
+        return self.brw
+
+    async def get_token(self, min_valid_until: float) -> str | None:
+        brw = await self.browser()
+        token = await brw.get_access_token_in_safe()
+        if not is_valid_until(token, min_valid_until):
+            token = await brw.refresh_access_token()
+        return token
+
+    async def close(self) -> None:
+        await self.exit_stack.aclose()
+        self.brw = None
+
+
+class StubTokenProvider(TokenProvider):
+    """Unsigned token for tests and runs against fake G2G services."""
+
+    name = "stub"
+
+    def __init__(self, sub: str, ttl: float = 24 * 60 * 60) -> None:
+        self.sub = sub
+        self.ttl = ttl
+
+    async def get_token(self, min_valid_until: float) -> str | None:
+        exp = int(max(datetime.now().timestamp() + self.ttl, min_valid_until + 1))
+        return (
+            ".".join(
+                base64.urlsafe_b64encode(json.dumps(part).encode("utf-8"))
+                .decode("utf-8")
+                .rstrip("=")
+                for part in (
+                    {"alg": "none", "typ": "JWT"},
+                    {"sub": self.sub, "exp": exp},
+                )
+            )
+            + "."
+        )
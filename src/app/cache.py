@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Generic, Hashable, TypeVar
+
+from .logger import logger
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """In-memory LRU cache whose entries expire after `ttl` seconds.
+
+    If `file_path` is given, entries are also persisted as JSON so a restart
+    starts warm. Changes are written by `flush`, once per round rather than on
+    every insert. `dump`/`load` convert values to and from JSON-able data.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int,
+        file_path: Path | None = None,
+        dump: Callable[[V], Any] = lambda value: value,
+        load: Callable[[Any], V] = lambda data: data,
+    ) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.file_path = file_path
+        self.dump = dump
+        self.load = load
+        self.entries: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self.dirty = False
+
+        if self.file_path:
+            self.load_file()
+
+    def get(self, key: Hashable) -> V | None:
+        if key not in self.entries:
+            return None
+
+        expires_at, value = self.entries[key]
+        if expires_at <= time.time():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        self.entries[key] = (time.time() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        self.dirty = True
+
+    def invalidate(self, key: Hashable) -> None:
+        if self.entries.pop(key, None) is not None:
+            logger.info(f"Invalidate cache: {key}")
+            self.dirty = True
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.dirty = True
+
+    async def flush(self) -> None:
+        """Write pending changes to the file without blocking the loop."""
+        if not self.file_path or not self.dirty:
+            return
+
+        data = self.dump_entries()
+        self.dirty = False
+        try:
+            await asyncio.to_thread(self.write_file, data)
+        except Exception:
+            self.dirty = True
+            raise
+
+    def load_file(self) -> None:
+        if not self.file_path or not self.file_path.exists():
+            return
+
+        try:
+            data = json.loads(self.file_path.read_text(encoding="utf-8"))
+            now = time.time()
+            for key, expires_at, value in data:
+                if expires_at > now:
+                    self.entries[tuple(key)] = (expires_at, self.load(value))
+        except Exception as e:
+            logger.error(f"Load cache file {self.file_path} failed: {e}")
+            self.entries.clear()
+
+    def dump_entries(self) -> list:
+        return [
+            [list(key), expires_at, self.dump(value)]  # type: ignore[arg-type]
+            for key, (expires_at, value) in self.entries.items()
+        ]
+
+    def write_file(self, data: list) -> None:
+        if not self.file_path:
+            return
+
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.file_path.with_suffix(f"{self.file_path.suffix}.tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, self.file_path)
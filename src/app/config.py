@@ -2,7 +2,11 @@ import os
 from dotenv import load_dotenv
 
 
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, field_validator
+
+from .lazy import lazy
 
 
 class Config(BaseModel):
@@ -27,10 +31,111 @@ class Config(BaseModel):
     # Relax time each round in second
     RELAX_TIME_EACH_ROUND: int
 
+    # Sheet write buffer: flush every N rows or T seconds
+    SHEET_WRITE_BATCH_ROWS: int = 50
+    SHEET_WRITE_FLUSH_INTERVAL: float = 30
+
+    # Sheets API budgets in requests per minute, burst is the max bucket size
+    SHEETS_READ_PER_MINUTE: float = 50
+    SHEETS_WRITE_PER_MINUTE: float = 50
+    SHEETS_BURST: float = 5
+
+    # Row workers: global limit and per service/brand limit (0 = no limit)
+    MAX_CONCURRENT_ROWS: int = 1
+    MAX_CONCURRENT_ROWS_PER_BRAND: int = 0
+
+    # Max offers per G2G bulk status update
+    G2G_BULK_UPDATE_CHUNK_SIZE: int = 50
+
+    # G2G API base url, point it to a local stand-in server for testing
+    G2G_API_BASE_URL: str = "https://sls.g2g.com"
+    # Load the seller offer listing once a round instead of one status call
+    # per LIST/DELIST row. Off until the listing route is confirmed on G2G.
+    G2G_SELLER_OFFER_INDEX: bool = False
+    # Page size and page cap of the seller offer listing
+    G2G_SELLER_OFFERS_PAGE_SIZE: int = 100
+    G2G_SELLER_OFFERS_MAX_PAGES: int = 100
+
+    # G2G HTTP transport: connection pools and timeouts in seconds. The API
+    # and assets hosts each get their own pool out of G2G_MAX_CONNECTIONS, any
+    # other host shares the rest. Catalog and write endpoints are slower.
+    G2G_HTTP2: bool = True
+    G2G_MAX_CONNECTIONS: int = 20
+    G2G_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    G2G_KEEPALIVE_EXPIRY: float = 60
+    G2G_API_MAX_CONNECTIONS: int = 10
+    G2G_ASSETS_MAX_CONNECTIONS: int = 2
+    G2G_CONNECT_TIMEOUT: float = 5
+    G2G_READ_TIMEOUT: float = 10
+    G2G_CATALOG_READ_TIMEOUT: float = 30
+    G2G_WRITE_READ_TIMEOUT: float = 30
+
+    # Adaptive G2G concurrency, separate for seller (authenticated) and public
+    # catalog endpoints. Slower responses than the threshold lower the limit.
+    G2G_INITIAL_CONCURRENCY: float = 2
+    G2G_SELLER_MAX_CONCURRENCY: float = 8
+    G2G_PUBLIC_MAX_CONCURRENCY: float = 16
+    G2G_LATENCY_THRESHOLD: float = 5
+
+    # G2G collections cache (file is relative to the project root)
+    G2G_COLLECTIONS_CACHE_TTL: float = 6 * 60 * 60
+    G2G_COLLECTIONS_CACHE_SIZE: int = 128
+    G2G_COLLECTIONS_CACHE_FILE: str | None = "cache/collections.json"
+
+    # Max collection ids per attributes search when prefetching DPD collections
+    G2G_ATTRIBUTES_SEARCH_CHUNK_SIZE: int = 50
+
+    # Skip LIST/DELIST rows already in their target status, re-check them
+    # with G2G after the interval
+    ROW_STATE_REVALIDATE_INTERVAL: float = 60 * 60
+
+    # Change probe: skip rounds while the spreadsheet is unchanged. The round
+    # interval doubles from RELAX_TIME_EACH_ROUND (at least 1 second) up to the
+    # max while idle, a full round still runs after the full round interval.
+    SHEET_PROBE_MAX_INTERVAL: float = 10 * 60
+    SHEET_PROBE_FULL_ROUND_INTERVAL: float = 30 * 60
+
+    # Local SQLite database for the row job queue and the state store
+    # (relative to the project root). A job failing JOB_MAX_ATTEMPTS times
+    # backs off from JOB_RETRY_DELAY seconds, doubling up to
+    # JOB_MAX_RETRY_DELAY. A lease older than JOB_LEASE_TIMEOUT seconds is
+    # handed out again.
+    STATE_DB_FILE: str = "cache/state.sqlite3"
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_DELAY: float = 60
+    JOB_MAX_RETRY_DELAY: float = 60 * 60
+    JOB_LEASE_TIMEOUT: float = 60 * 60
+
+    # Chrome profile directory and the per-round progress file read by the
+    # supervisor (both relative to the project root, no file when unset)
+    USER_DIR: str = "user_dir"
+    STATUS_FILE: str | None = None
+
+    # Supervisor: shards file, restart backoff cap and progress report interval
+    # in seconds
+    SHARDS_FILE: str = "shards.json"
+    SHARD_RESTART_MAX_BACKOFF: float = 5 * 60
+    SHARD_STATUS_INTERVAL: float = 60
+
+    # Refresh the access token this many seconds before it expires
+    TOKEN_REFRESH_MARGIN: float = 5 * 60
+    # Where tokens come from: "auto" reuses G2G_ACCESS_TOKEN or TOKEN_FILE
+    # while valid and starts Chrome only when needed, "stub" signs nothing and
+    # is meant for fake G2G services. Every new token is saved to TOKEN_FILE.
+    TOKEN_PROVIDER: Literal["auto", "file", "browser", "stub"] = "auto"
+    TOKEN_FILE: str | None = "cache/token.jwt"
+    G2G_ACCESS_TOKEN: str | None = None
+
+    @field_validator("G2G_ACCESS_TOKEN")
+    @classmethod
+    def empty_as_none(cls, value: str | None) -> str | None:
+        # An empty value clears a token set in setting.env (see supervisor.py)
+        return value or None
+
     @staticmethod
     def from_env() -> "Config":
         load_dotenv("setting.env")
         return Config.model_validate({k: v for k, v in os.environ.items()})
 
 
-config = Config.from_env()
+config: Config = lazy(Config.from_env)
@@ -0,0 +1,12 @@
+import sqlite3
+from pathlib import Path
+
+
+def connect(file_path: Path) -> sqlite3.Connection:
+    """Open the local state database, shared by the job queue and state store."""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(file_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
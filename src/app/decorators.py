@@ -1,21 +1,129 @@
+import asyncio
+import functools
+import inspect
+import random
 import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import Callable
+
+from httpx import ConnectError, ConnectTimeout, PoolTimeout
+
 from app.logger import logger
 
+RETRY_AFTER_STATUS_CODES: set[int] = {429, 503}
+# 4xx responses that are worth retrying, every other 4xx is a client error
+RETRYABLE_CLIENT_STATUS_CODES: set[int] = {408, 425, 429}
+
+
+def get_status_code(e: Exception) -> int | None:
+    # httpx.HTTPStatusError and gspread.exceptions.APIError both carry .response
+    response = getattr(e, "response", None)
+    status_code = getattr(response, "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def get_retry_after(e: Exception) -> float | None:
+    if get_status_code(e) not in RETRY_AFTER_STATUS_CODES:
+        return None
+
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    return parse_retry_after(headers.get("Retry-After"))
+
+
+def parse_retry_after(retry_after: str | None) -> float | None:
+    if not retry_after:
+        return None
+
+    try:
+        return max(float(retry_after), 0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+def is_retryable(e: Exception) -> bool:
+    # Bad response bodies (pydantic ValidationError, JSON errors) and bad
+    # input fail the same way every time
+    if isinstance(e, ValueError):
+        return False
+
+    status_code = get_status_code(e)
+    if status_code is None:
+        return True
+    return not (400 <= status_code < 500) or status_code in (
+        RETRYABLE_CLIENT_STATUS_CODES
+    )
+
+
+def is_unsent(e: Exception) -> bool:
+    """The request surely did not reach the server, safe to retry a create."""
+    return isinstance(e, (ConnectError, ConnectTimeout, PoolTimeout)) or (
+        get_status_code(e) == 429
+    )
+
+
+def retry_on_fail(
+    max_retries: int = 3,
+    sleep_interval: float = 0.5,
+    max_sleep_interval: float = 60,
+    backoff_factor: float = 2,
+    jitter: float = 0.5,
+    retry_on: Callable[[Exception], bool] = is_retryable,
+):
+    """Retry a sync or async function on failure.
+
+    The n-th retry waits `sleep_interval * backoff_factor ** n` seconds (capped
+    at `max_sleep_interval`, +/- `jitter` of it), or the Retry-After of a
+    429/503 response, capped the same way. Only errors `retry_on` accepts are
+    retried, by default not 4xx client errors or bad responses.
+    """
+
+    def get_delay(i: int, e: Exception) -> float:
+        retry_after = get_retry_after(e)
+        if retry_after is not None:
+            return min(retry_after, max_sleep_interval)
+
+        delay = min(sleep_interval * backoff_factor**i, max_sleep_interval)
+        return delay * random.uniform(1 - jitter, 1 + jitter)
 
-def retry_on_fail(max_retries: int = 3, sleep_interval: float = 0.5):
     def wrapper(func: Callable):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_inner(*args, **kwagrs):
+                for i in range(max_retries + 1):
+                    try:
+                        return await func(*args, **kwagrs)
+                    except Exception as e:
+                        if i == max_retries or not retry_on(e):
+                            raise e
+                        delay = get_delay(i, e)
+                        logger.info(
+                            f"Retry: {func.__name__}, {i + 1} times in {delay:.1f}s, failed reason: {e}"
+                        )
+                        await asyncio.sleep(delay)
+
+            return async_inner
+
+        @functools.wraps(func)
         def inner(*args, **kwagrs):
             for i in range(max_retries + 1):
                 try:
                     return func(*args, **kwagrs)
                 except Exception as e:
-                    if i == max_retries:
+                    if i == max_retries or not retry_on(e):
                         raise e
+                    delay = get_delay(i, e)
                     logger.info(
-                        f"Retry: {func.__name__}, {i + 1} times, failed reason: {e}"
+                        f"Retry: {func.__name__}, {i + 1} times in {delay:.1f}s, failed reason: {e}"
                     )
-                    time.sleep(sleep_interval)
+                    time.sleep(delay)
 
         return inner
 
@@ -1,5 +1,14 @@
-from httpx import Client, HTTPStatusError
-from typing import Final
+import time
+
+from httpx import (
+    AsyncClient,
+    HTTPStatusError,
+    Response as HTTPResponse,
+    Timeout,
+    TransportError,
+)
+from typing import Any, Final
+from pydantic import ValidationError
 
 from .models import (
     Response,
@@ -8,29 +17,100 @@ from .models import (
     KeywordDict,
     CategoryJson,
     KeywordRelation,
-    Collection,
+    CompactCollection,
+    CompactCollectionResponse,
     CreateOfferPayload,
     CreatedOfferResponse,
     GetOfferResponse,
+    GetOfferStatusResponse,
     BulkUpdateResponse,
+    SellerOffer,
 )
 
+from ..cache import TTLCache
+from ..config import config
 from ..logger import logger
-from ..decorators import retry_on_fail
+from ..decorators import is_unsent, parse_retry_after, retry_on_fail
+from .rate_limit import AdaptiveLimiter
+from .transport import PoolStats, TransportSettings, build_async_client
+from ..paths import ROOT_PATH
+from ..lazy import lazy
 
 CRWL_G2G_API_BASE_URL: Final[str] = "https://sls.g2g.com"
+G2G_ASSETS_BASE_URL: Final[str] = "https://assets.g2g.com"
 G2G_API_VERSION: Final[str] = "v2"
 
 
-class CrwlG2GAPI:
-    def __init__(self) -> None:
-        self.client = Client()
-        self.base_url = CRWL_G2G_API_BASE_URL
+class AsyncCrwlG2GAPI:
+    def __init__(
+        self,
+        collections_cache: TTLCache[CompactCollectionResponse] | None = None,
+        dpd_collections_cache: TTLCache[list[CompactCollection]] | None = None,
+        attributes_search_chunk_size: int = 50,
+        base_url: str = CRWL_G2G_API_BASE_URL,
+        seller_limiter: AdaptiveLimiter | None = None,
+        public_limiter: AdaptiveLimiter | None = None,
+        client: AsyncClient | None = None,
+        pool_stats: PoolStats | None = None,
+        catalog_read_timeout: float | None = None,
+        write_read_timeout: float | None = None,
+    ) -> None:
+        self.client = client or AsyncClient()
+        self.pool_stats = pool_stats
+        self.catalog_read_timeout = catalog_read_timeout
+        self.write_read_timeout = write_read_timeout
+        self.base_url = base_url
+        self.seller_limiter = seller_limiter
+        self.public_limiter = public_limiter
         self.version = G2G_API_VERSION
+        self.collections_cache = collections_cache
+        self.dpd_collections_cache = dpd_collections_cache
+        self.attributes_search_chunk_size = attributes_search_chunk_size
 
-    @retry_on_fail()
-    def get_categories(self) -> Response[Category]:
-        res = self.client.get(f"{self.base_url}/offer/category")
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        read_timeout: float | None = None,
+        **kwargs: Any,
+    ) -> HTTPResponse:
+        if read_timeout is not None:
+            timeout = self.client.timeout
+            kwargs["timeout"] = Timeout(
+                connect=timeout.connect,
+                read=read_timeout,
+                write=timeout.write,
+                pool=timeout.pool,
+            )
+
+        async def send() -> HTTPResponse:
+            # The trace clock starts here, after any limiter wait, so pool
+            # queue time only counts waiting for a connection
+            if self.pool_stats is not None:
+                kwargs["extensions"] = {"trace": self.pool_stats.trace()}
+            return await self.client.request(method, url, **kwargs)
+
+        # Requests carrying the seller token use the seller budget
+        limiter = (
+            self.seller_limiter
+            if "authorization" in kwargs.get("headers", {})
+            else self.public_limiter
+        )
+        if limiter is None:
+            res = await send()
+        else:
+            async with limiter.slot():
+                start = time.monotonic()
+                try:
+                    res = await send()
+                except TransportError:
+                    limiter.on_response(None, time.monotonic() - start)
+                    raise
+                limiter.on_response(
+                    res.status_code,
+                    time.monotonic() - start,
+                    parse_retry_after(res.headers.get("Retry-After")),
+                )
 
         try:
             res.raise_for_status()
@@ -39,52 +119,69 @@ class CrwlG2GAPI:
             logger.exception(e)
             res.raise_for_status()
 
+        return res
+
+    def limiter_stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            limiter.name: limiter.stats()
+            for limiter in (self.seller_limiter, self.public_limiter)
+            if limiter is not None
+        }
+
+    def connection_pool_stats(self) -> dict[str, Any]:
+        return self.pool_stats.stats() if self.pool_stats is not None else {}
+
+    async def save_caches(self) -> None:
+        for cache in (self.collections_cache, self.dpd_collections_cache):
+            if cache is not None:
+                await cache.flush()
+
+    @retry_on_fail()
+    async def get_categories(self) -> Response[Category]:
+        res = await self._request(
+            "GET",
+            f"{self.base_url}/offer/category",
+            read_timeout=self.catalog_read_timeout,
+        )
+
         return Response[Category].model_validate(res.json())
 
     @retry_on_fail()
-    def get_brands(self, category_id: str) -> Response[Brand]:
-        res = self.client.get(
-            f"{self.base_url}/{self.version}/offer/category/{category_id}/brands?page_size=10000"
+    async def get_brands(self, category_id: str) -> Response[Brand]:
+        res = await self._request(
+            "GET",
+            f"{self.base_url}/{self.version}/offer/category/{category_id}/brands?page_size=10000",
+            read_timeout=self.catalog_read_timeout,
         )
-        try:
-            res.raise_for_status()
-        except HTTPStatusError as e:
-            logger.error(res.text)
-            logger.exception(e)
-            res.raise_for_status()
 
         return Response[Brand].model_validate(res.json())
 
     @retry_on_fail()
-    def get_keywords(
+    async def get_keywords(
         self,
     ) -> KeywordDict:
-        res = self.client.get("https://assets.g2g.com/offer/keyword.json")
-        try:
-            res.raise_for_status()
-        except HTTPStatusError as e:
-            logger.error(res.text)
-            logger.exception(e)
-            res.raise_for_status()
+        res = await self._request(
+            "GET",
+            f"{G2G_ASSETS_BASE_URL}/offer/keyword.json",
+            read_timeout=self.catalog_read_timeout,
+        )
 
         return KeywordDict.model_validate(res.json())
 
     @retry_on_fail()
-    def get_category_json(
+    async def get_category_json(
         self,
     ) -> CategoryJson:
-        res = self.client.get("https://assets.g2g.com/offer/categories.json")
-        try:
-            res.raise_for_status()
-        except HTTPStatusError as e:
-            logger.error(res.text)
-            logger.exception(e)
-            res.raise_for_status()
+        res = await self._request(
+            "GET",
+            f"{G2G_ASSETS_BASE_URL}/offer/categories.json",
+            read_timeout=self.catalog_read_timeout,
+        )
 
         return CategoryJson.model_validate(res.json())
 
     @retry_on_fail()
-    def get_keyword_relation(
+    async def get_keyword_relation(
         self,
         relation_id: str | None = None,
         service_id: str | None = None,
@@ -102,26 +199,53 @@ class CrwlG2GAPI:
         if region_id:
             query_params["region_id"] = region_id
 
-        res = self.client.get(
+        res = await self._request(
+            "GET",
             f"{self.base_url}/offer/keyword_relation/search",
             params=query_params,
+            read_timeout=self.catalog_read_timeout,
         )
-        try:
-            res.raise_for_status()
-        except HTTPStatusError as e:
-            logger.error(res.text)
-            logger.exception(e)
-            res.raise_for_status()
 
         return Response[KeywordRelation].model_validate(res.json())
 
+    async def get_collections(
+        self,
+        service_id: str | None = None,
+        brand_id: str | None = None,
+        region_id: str | None = None,
+    ) -> CompactCollectionResponse:
+        key = (service_id, brand_id, region_id)
+        if self.collections_cache is not None:
+            collections = self.collections_cache.get(key)
+            if collections is not None:
+                return collections
+
+        collections = await self.fetch_collections(
+            service_id=service_id,
+            brand_id=brand_id,
+            region_id=region_id,
+        )
+        if self.collections_cache is not None:
+            self.collections_cache.set(key, collections)
+
+        return collections
+
+    def invalidate_collections(
+        self,
+        service_id: str | None = None,
+        brand_id: str | None = None,
+        region_id: str | None = None,
+    ) -> None:
+        if self.collections_cache is not None:
+            self.collections_cache.invalidate((service_id, brand_id, region_id))
+
     @retry_on_fail()
-    def get_collections(
+    async def fetch_collections(
         self,
         service_id: str | None = None,
         brand_id: str | None = None,
         region_id: str | None = None,
-    ) -> Response[Collection]:
+    ) -> CompactCollectionResponse:
         query_params: dict[str, str] = {"include_searchable_only": "0"}
 
         if service_id:
@@ -131,30 +255,30 @@ class CrwlG2GAPI:
         if region_id:
             query_params["region_id"] = region_id
 
-        res = self.client.get(
+        res = await self._request(
+            "GET",
             f"{self.base_url}/offer/keyword_relation/collection/",
             params=query_params,
+            read_timeout=self.catalog_read_timeout,
         )
 
-        try:
-            res.raise_for_status()
-        except HTTPStatusError as e:
-            logger.error(res.text)
-            logger.exception(e)
-            res.raise_for_status()
-
-        return Response[Collection].model_validate(res.json())
+        return CompactCollectionResponse.model_validate_json(res.content)
 
     @retry_on_fail()
-    def get_product_settings(self, service_id: str, brand_id: str):
-        res = self.client.get(
-            f"https://sls.g2g.com/offer/product_settings/service/{service_id}/brand/{brand_id}/product_settings"
+    async def get_product_settings(
+        self, service_id: str, brand_id: str
+    ) -> dict[str, Any]:
+        res = await self._request(
+            "GET",
+            f"{self.base_url}/offer/product_settings/service/{service_id}/brand/{brand_id}/product_settings",
+            read_timeout=self.catalog_read_timeout,
         )
 
-        print(res.json())
+        return res.json()
 
-    @retry_on_fail()
-    def create_offer(
+    # Not idempotent: a retry after G2G got the request would create it twice
+    @retry_on_fail(retry_on=is_unsent)
+    async def create_offer(
         self,
         payload: CreateOfferPayload,
         token: str,
@@ -163,22 +287,18 @@ class CrwlG2GAPI:
             "authorization": token,
             "Content-Type": "application/json",
         }
-        res = self.client.post(
+        res = await self._request(
+            "POST",
             f"{self.base_url}/offer",
             headers=headers,
             json=payload.model_dump(mode="json", exclude_none=True),
+            read_timeout=self.write_read_timeout,
         )
-        try:
-            res.raise_for_status()
-        except HTTPStatusError as e:
-            logger.error(res.text)
-            logger.exception(e)
-            res.raise_for_status()
 
         return CreatedOfferResponse.model_validate(res.json())
 
     @retry_on_fail()
-    def get_offer(
+    async def get_offer(
         self,
         offer_id: str,
         token,
@@ -187,53 +307,123 @@ class CrwlG2GAPI:
             "authorization": token,
             "Content-Type": "application/json",
         }
-        res = self.client.get(
+        res = await self._request(
+            "GET",
             f"{self.base_url}/offer/{offer_id}?include_out_of_stock=1&include_inactive=1",
             headers=headers,
         )
 
-        try:
-            res.raise_for_status()
-        except HTTPStatusError as e:
-            logger.error(res.text)
-            logger.exception(e)
-            res.raise_for_status()
-
         return GetOfferResponse.model_validate(res.json())
 
     @retry_on_fail()
-    def bulk_update(
+    async def get_offer_status(
         self,
         offer_id: str,
+        token,
+    ) -> GetOfferStatusResponse:
+        headers = {
+            "authorization": token,
+            "Content-Type": "application/json",
+        }
+        res = await self._request(
+            "GET",
+            f"{self.base_url}/offer/{offer_id}?include_out_of_stock=1&include_inactive=1",
+            headers=headers,
+        )
+
+        return GetOfferStatusResponse.model_validate_json(res.content)
+
+    @retry_on_fail()
+    async def get_seller_offers(
+        self,
+        seller_id: str,
+        token: str,
+        page: int = 1,
+        page_size: int = 100,
+    ) -> Response[SellerOffer]:
+        headers = {
+            "authorization": token,
+            "Content-Type": "application/json",
+        }
+        query_params: dict[str, str | int] = {
+            "seller_id": seller_id,
+            "page": page,
+            "page_size": page_size,
+            "include_out_of_stock": 1,
+            "include_inactive": 1,
+        }
+        res = await self._request(
+            "GET",
+            f"{self.base_url}/offer/search",
+            headers=headers,
+            params=query_params,
+        )
+
+        return Response[SellerOffer].model_validate(res.json())
+
+    async def get_all_seller_offers(
+        self,
+        seller_id: str,
+        token: str,
+        page_size: int = 100,
+        max_pages: int = 100,
+    ) -> list[SellerOffer]:
+        seller_offers: list[SellerOffer] = []
+        last_offer_ids: list[str] = []
+        for page in range(1, max_pages + 1):
+            results = (
+                await self.get_seller_offers(
+                    seller_id=seller_id,
+                    token=token,
+                    page=page,
+                    page_size=page_size,
+                )
+            ).payload.results
+            offer_ids = [seller_offer.offer_id for seller_offer in results]
+            # A server ignoring `page` returns the same page again
+            if len(results) == 0 or offer_ids == last_offer_ids:
+                return seller_offers
+
+            seller_offers.extend(results)
+            if len(results) < page_size:
+                return seller_offers
+            last_offer_ids = offer_ids
+
+        logger.warning(f"Seller offers: stopped at the {max_pages} page limit")
+        return seller_offers
+
+    @retry_on_fail()
+    async def bulk_update(
+        self,
+        offer_ids: list[str],
         status: str,
         token: str,
         user_id: str,
-    ):
+    ) -> BulkUpdateResponse | None:
         headers = {
             "authorization": token,
             "Content-Type": "application/json",
         }
         payload = {
-            "offer_ids": [offer_id],
+            "offer_ids": offer_ids,
             "status": status,
         }
-        res = self.client.put(
+        res = await self._request(
+            "PUT",
             f"{self.base_url}/offer/seller/{user_id}/bulk_update",
             headers=headers,
             json=payload,
+            read_timeout=self.write_read_timeout,
         )
 
         try:
-            res.raise_for_status()
-        except HTTPStatusError as e:
-            logger.error(res.text)
-            logger.exception(e)
-            res.raise_for_status()
-
-        # return BulkUpdateResponse.model_validate(res.json())
+            return BulkUpdateResponse.model_validate(res.json())
+        except ValidationError:
+            logger.warning(f"Unexpected bulk update response: {res.text}")
+            return None
 
     @retry_on_fail()
-    def update_offer(
+    async def update_offer(
         self,
         offer_id: str,
         payload: CreateOfferPayload,
@@ -243,37 +433,125 @@ class CrwlG2GAPI:
             "authorization": token,
             "Content-Type": "application/json",
         }
-        res = self.client.put(
+        res = await self._request(
+            "PUT",
             f"{self.base_url}/offer/{offer_id}",
             headers=headers,
             json=payload.model_dump(mode="json", exclude_none=True),
+            read_timeout=self.write_read_timeout,
         )
-        try:
-            res.raise_for_status()
-        except HTTPStatusError as e:
-            logger.error(res.text)
-            logger.exception(e)
-            res.raise_for_status()
 
         return CreatedOfferResponse.model_validate(res.json())
 
     @retry_on_fail()
-    def attributes_search(self, collection_ids: list[str]) -> Response[Collection]:
+    async def attributes_search(
+        self, collection_ids: list[str]
+    ) -> CompactCollectionResponse:
         payload = {
             "collection_ids": collection_ids,
         }
 
-        res = self.client.post(
-            f"{self.base_url}/offer/keyword_relation/attributes/search", json=payload
+        res = await self._request(
+            "POST",
+            f"{self.base_url}/offer/keyword_relation/attributes/search",
+            json=payload,
+            read_timeout=self.catalog_read_timeout,
         )
-        try:
-            res.raise_for_status()
-        except HTTPStatusError as e:
-            logger.error(res.text)
-            logger.exception(e)
-            res.raise_for_status()
 
-        return Response[Collection].model_validate(res.json())
+        return CompactCollectionResponse.model_validate_json(res.content)
+
+    async def get_dpd_collections(
+        self, collection_ids: list[str]
+    ) -> list[CompactCollection]:
+        key = tuple(sorted(collection_ids))
+        if self.dpd_collections_cache is not None:
+            collections = self.dpd_collections_cache.get(key)
+            if collections is not None:
+                return collections
+
+        collections = (await self.attributes_search(list(key))).payload.results
+        if self.dpd_collections_cache is not None:
+            self.dpd_collections_cache.set(key, collections)
 
+        return collections
 
-crwl_g2g_api_client = CrwlG2GAPI()
+    async def prefetch_dpd_collections(
+        self,
+        collection_id_groups: list[list[str]],
+    ) -> None:
+        """Resolve the DPD collections of many lookups with as few searches as possible."""
+        if self.dpd_collections_cache is None:
+            return
+
+        missing_keys = {
+            key
+            for key in (tuple(sorted(group)) for group in collection_id_groups)
+            if self.dpd_collections_cache.get(key) is None
+        }
+        collection_ids = sorted({id for key in missing_keys for id in key})
+        if len(collection_ids) == 0:
+            return
+
+        logger.info(f"Prefetch {len(collection_ids)} DPD collections")
+        collections_by_id: dict[str, CompactCollection] = {}
+        for i in range(0, len(collection_ids), self.attributes_search_chunk_size):
+            chunk = collection_ids[i : i + self.attributes_search_chunk_size]
+            for collection in (await self.attributes_search(chunk)).payload.results:
+                collections_by_id[collection.collection_id] = collection
+
+        # Lookups whose collections were not all returned are fetched on use
+        for key in missing_keys:
+            if all(id in collections_by_id for id in key):
+                self.dpd_collections_cache.set(
+                    key, [collections_by_id[id] for id in key]
+                )
+
+
+async_crwl_g2g_api_client = lazy(
+    lambda: AsyncCrwlG2GAPI(
+        collections_cache=TTLCache(
+            ttl=config.G2G_COLLECTIONS_CACHE_TTL,
+            max_size=config.G2G_COLLECTIONS_CACHE_SIZE,
+            file_path=ROOT_PATH.joinpath(config.G2G_COLLECTIONS_CACHE_FILE)
+            if config.G2G_COLLECTIONS_CACHE_FILE
+            else None,
+            dump=lambda collections: collections.model_dump(mode="json"),
+            load=CompactCollectionResponse.model_validate,
+        ),
+        dpd_collections_cache=TTLCache(
+            ttl=config.G2G_COLLECTIONS_CACHE_TTL,
+            max_size=config.G2G_COLLECTIONS_CACHE_SIZE * 8,
+        ),
+        attributes_search_chunk_size=config.G2G_ATTRIBUTES_SEARCH_CHUNK_SIZE,
+        base_url=config.G2G_API_BASE_URL,
+        client=build_async_client(
+            TransportSettings(
+                http2=config.G2G_HTTP2,
+                max_connections=config.G2G_MAX_CONNECTIONS,
+                max_keepalive_connections=config.G2G_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=config.G2G_KEEPALIVE_EXPIRY,
+                host_max_connections={
+                    config.G2G_API_BASE_URL: config.G2G_API_MAX_CONNECTIONS,
+                    G2G_ASSETS_BASE_URL: config.G2G_ASSETS_MAX_CONNECTIONS,
+                },
+                connect_timeout=config.G2G_CONNECT_TIMEOUT,
+                read_timeout=config.G2G_READ_TIMEOUT,
+            )
+        ),
+        pool_stats=PoolStats(),
+        catalog_read_timeout=config.G2G_CATALOG_READ_TIMEOUT,
+        write_read_timeout=config.G2G_WRITE_READ_TIMEOUT,
+        seller_limiter=AdaptiveLimiter(
+            name="seller",
+            initial_limit=config.G2G_INITIAL_CONCURRENCY,
+            max_limit=config.G2G_SELLER_MAX_CONCURRENCY,
+            latency_threshold=config.G2G_LATENCY_THRESHOLD,
+        ),
+        public_limiter=AdaptiveLimiter(
+            name="public",
+            initial_limit=config.G2G_INITIAL_CONCURRENCY,
+            max_limit=config.G2G_PUBLIC_MAX_CONCURRENCY,
+            latency_threshold=config.G2G_LATENCY_THRESHOLD,
+        ),
+    )
+)
@@ -1,2 +1,6 @@
 class G2GCrwlAPIError(Exception):
     pass
+
+
+class OfferAttributeMismatchError(Exception):
+    pass
@@ -1,7 +1,7 @@
 import re
 from urllib.parse import urlparse, parse_qs
 
-from pydantic import BaseModel, RootModel
+from pydantic import BaseModel, PrivateAttr, RootModel
 from typing import Generic, TypeVar, Literal
 
 from .enums import InputField
@@ -128,6 +128,86 @@ class Collection(BaseModel):
     children: list[ChildrenCollection]
 
 
+# Compact collection tree, only what offer attributes are built from
+
+
+class CompactChildrenCollection(BaseModel):
+    collection_id: str
+    dataset_id: str
+    value: str
+    children: list["CompactChildrenCollection"]
+    dpd_collections: list[DpdCollection]
+
+
+class CompactCollection(BaseModel):
+    collection_id: str
+    value: str
+    sort_order: int
+    input_field: InputField
+    is_required: bool
+    children: list[CompactChildrenCollection]
+
+    _index: "CollectionIndex | None" = PrivateAttr(default=None)
+
+    def index(self) -> "CollectionIndex":
+        if self._index is None:
+            self._index = CollectionIndex(self)
+        return self._index
+
+
+class CompactCollectionResponse(BaseModel):
+    code: int
+    messages: list[str]
+    payload: ResponseResult[CompactCollection]
+    request_id: str
+
+
+def normalize_attribute_value(value: str) -> str:
+    return value.strip().lower()
+
+
+class CollectionIndex:
+    """Lookup tables compiled once from a collection tree.
+
+    entries: normalized leaf value -> offer attribute (collection_id, dataset_id)
+    accepted_values: leaf values in tree order
+    dpd_collections: direct child value -> its DPD collections
+    """
+
+    def __init__(self, collection: CompactCollection) -> None:
+        self.entries: dict[str, OfferAttribute] = {}
+        self.accepted_values: list[str] = []
+        self.dpd_collections: dict[str, list[DpdCollection]] = {}
+
+        for child in collection.children:
+            # Children sharing a value contribute all their DPD collections
+            for dpd_collection in child.dpd_collections:
+                dpd_collections = self.dpd_collections.setdefault(child.value, [])
+                if dpd_collection not in dpd_collections:
+                    dpd_collections.append(dpd_collection)
+
+        stack = list(reversed(collection.children))
+        seen_values: set[str] = set()
+        while stack:
+            child = stack.pop()
+            if len(child.children) > 0:
+                stack.extend(reversed(child.children))
+                continue
+
+            if child.value not in seen_values:
+                seen_values.add(child.value)
+                self.accepted_values.append(child.value)
+            self.entries.setdefault(
+                normalize_attribute_value(child.value),
+                OfferAttribute(
+                    collection_id=child.collection_id, dataset_id=child.dataset_id
+                ),
+            )
+
+    def lookup(self, attribute_value: str) -> "OfferAttribute | None":
+        return self.entries.get(normalize_attribute_value(attribute_value))
+
+
 #################
 #
 # URL
@@ -382,6 +462,31 @@ class GetOfferResponse(BaseModel):
     request_id: str
 
 
+class OfferStatusView(BaseModel):
+    offer_id: str
+    status: str
+
+
+class GetOfferStatusResponse(BaseModel):
+    code: int
+    messages: list[str]
+    payload: OfferStatusView
+    request_id: str
+
+
+#################
+#
+# Seller offer listing
+#
+
+
+class SellerOffer(BaseModel):
+    offer_id: str
+    status: str
+    available_qty: int | None = None
+    unit_price: float | None = None
+
+
 #################
 #
 # Bulk Update
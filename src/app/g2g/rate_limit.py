@@ -0,0 +1,97 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator
+
+from ..logger import logger
+
+# Minimum time between two decreases, so one burst of errors halves only once
+DECREASE_COOLDOWN: float = 1
+DEFAULT_THROTTLE_DELAY: float = 1
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter driven by G2G responses.
+
+    The limit grows by 1/limit on each fast successful response and is
+    multiplied by `backoff` on a 429, a 5xx, a transport error or a response
+    slower than `latency_threshold`. A 429/503 also pauses new requests for
+    its Retry-After.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: float,
+        max_limit: float,
+        latency_threshold: float,
+        min_limit: float = 1,
+        backoff: float = 0.5,
+    ) -> None:
+        self.name = name
+        self.limit = min(max(initial_limit, min_limit), max_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_threshold = latency_threshold
+        self.backoff = backoff
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+        self.paused_until = 0.0
+        self.last_decrease_at = 0.0
+        self.total_requests = 0
+        self.total_throttled = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncGenerator[None, None]:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+        try:
+            delay = self.paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield
+        finally:
+            async with self.condition:
+                self.in_flight -= 1
+                self.condition.notify_all()
+
+    def on_response(
+        self,
+        status_code: int | None,
+        latency: float,
+        retry_after: float | None = None,
+    ) -> None:
+        """Feed back one response. `status_code` is None on transport errors."""
+        self.total_requests += 1
+        throttled = status_code is None or status_code == 429 or status_code >= 500
+
+        if status_code in (429, 503):
+            self.total_throttled += 1
+            self.paused_until = max(
+                self.paused_until,
+                time.monotonic() + (retry_after or DEFAULT_THROTTLE_DELAY),
+            )
+
+        if throttled or latency > self.latency_threshold:
+            self.decrease()
+        elif status_code < 400:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def decrease(self) -> None:
+        now = time.monotonic()
+        if now - self.last_decrease_at < DECREASE_COOLDOWN:
+            return
+
+        self.last_decrease_at = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        logger.info(f"G2G {self.name} concurrency limit lowered to {self.limit:.2f}")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "requests": self.total_requests,
+            "throttled": self.total_throttled,
+        }
@@ -0,0 +1,105 @@
+import importlib.util
+import time
+from typing import Any, Callable, Coroutine
+
+from httpx import AsyncClient, AsyncHTTPTransport, Limits, Timeout
+from pydantic import BaseModel
+
+from ..logger import logger
+
+
+class TransportSettings(BaseModel):
+    http2: bool
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+    # Origin (e.g. "https://sls.g2g.com") -> max connections to that host
+    host_max_connections: dict[str, int]
+    connect_timeout: float
+    read_timeout: float
+
+
+class PoolStats:
+    """Connection pool statistics collected with the httpcore trace extension."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.new_connections = 0
+        self.connect_time = 0.0
+        self.queue_time = 0.0
+
+    def trace(self) -> Callable[[str, dict], Coroutine[Any, Any, None]]:
+        started_at = time.monotonic()
+        connect_started_at: float | None = None
+        connect_time = 0.0
+
+        async def callback(event_name: str, info: dict) -> None:
+            nonlocal connect_started_at, connect_time
+            if event_name == "connection.connect_tcp.started":
+                self.new_connections += 1
+                connect_started_at = time.monotonic()
+            elif event_name in (
+                "connection.connect_tcp.complete",
+                "connection.start_tls.complete",
+            ):
+                if connect_started_at is not None:
+                    connect_time = time.monotonic() - connect_started_at
+            elif event_name.endswith("send_request_headers.started"):
+                # Time spent waiting for a connection, without setting one up
+                self.requests += 1
+                self.connect_time += connect_time
+                self.queue_time += max(time.monotonic() - started_at - connect_time, 0)
+
+        return callback
+
+    def stats(self) -> dict[str, Any]:
+        requests = max(self.requests, 1)
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reuse_rate": round(
+                max(self.requests - self.new_connections, 0) / requests, 3
+            ),
+            "avg_connect_ms": round(self.connect_time / requests * 1000, 1),
+            "avg_queue_ms": round(self.queue_time / requests * 1000, 1),
+        }
+
+
+def build_async_client(settings: TransportSettings) -> AsyncClient:
+    http2 = settings.http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("Package h2 is not installed, use HTTP/1.1")
+        http2 = False
+
+    def limits(max_connections: int) -> Limits:
+        return Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(
+                max_connections, settings.max_keepalive_connections
+            ),
+            keepalive_expiry=settings.keepalive_expiry,
+        )
+
+    # Host pools come out of the overall budget first, every other host
+    # shares what is left
+    budget = settings.max_connections
+    host_limits: dict[str, int] = {}
+    for origin, max_connections in settings.host_max_connections.items():
+        host_limits[origin] = max(min(max_connections, budget), 1)
+        budget -= host_limits[origin]
+    total = sum(host_limits.values()) + max(budget, 1)
+    if total > settings.max_connections:
+        logger.warning(
+            f"G2G max connections {settings.max_connections} leave no room for "
+            f"every pool, using {total}"
+        )
+
+    return AsyncClient(
+        http2=http2,
+        limits=limits(max(budget, 1)),
+        timeout=Timeout(settings.read_timeout, connect=settings.connect_timeout),
+        mounts={
+            origin: AsyncHTTPTransport(http2=http2, limits=limits(max_connections))
+            for origin, max_connections in host_limits.items()
+        },
+    )
@@ -0,0 +1,288 @@
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+from .config import config
+from .db import connect
+from .lazy import lazy
+from .logger import logger
+from .paths import ROOT_PATH
+from .sheet.enums import ProcessType
+from .state import ROW_HASH_EXCLUDE_FIELDS
+
+PENDING = "pending"
+LEASED = "leased"
+# Jobs parked by older versions, they are retried like any pending job
+FAILED = "failed"
+
+
+class Job(BaseModel):
+    sheet_id: str
+    sheet_name: str
+    row_index: int
+    priority: int
+    model_dict: dict
+    attempts: int
+    # When the row snapshot was last queued or the job last failed
+    updated_at: float
+
+
+def job_priority(model_dict: dict) -> int:
+    """Lower runs first: delists and creates, then edits, then list rechecks."""
+    check = model_dict.get("Check")
+    if check == ProcessType.DELIST.value:
+        return 0
+    if check == ProcessType.LIST.value and not model_dict.get("Offer_ID"):
+        return 0
+    if check == ProcessType.EDIT.value:
+        return 1
+    return 2
+
+
+def job_hash(model_dict: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(
+            {k: v for k, v in model_dict.items() if k not in ROW_HASH_EXCLUDE_FIELDS},
+            sort_keys=True,
+            default=str,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+class JobQueue:
+    """Durable queue of row jobs in SQLite, one job per sheet row.
+
+    Sheet scans feed the queue, rounds lease jobs by priority and acknowledge
+    them once their writes are flushed, so a crash runs them again (at least
+    once). A failed job runs again next round. After `max_attempts` failures
+    it backs off instead, from `retry_delay` seconds doubling up to
+    `max_retry_delay`, until it succeeds or its row changes.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        max_attempts: int,
+        lease_timeout: float,
+        retry_delay: float = 60,
+        max_retry_delay: float = 60 * 60,
+    ) -> None:
+        self.file_path = file_path
+        self.max_attempts = max_attempts
+        self.lease_timeout = lease_timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.file_path)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    sheet_id TEXT NOT NULL,
+                    sheet_name TEXT NOT NULL,
+                    row_index INTEGER NOT NULL,
+                    priority INTEGER NOT NULL,
+                    model_json TEXT NOT NULL,
+                    row_hash TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    leased_until REAL,
+                    retry_at REAL,
+                    last_error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (sheet_id, sheet_name, row_index)
+                )
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "retry_at" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN retry_at REAL")
+            self._conn.execute(
+                "UPDATE jobs SET status = ? WHERE status = ?", (PENDING, FAILED)
+            )
+            self._conn.commit()
+        return self._conn
+
+    def enqueue(
+        self,
+        sheet_id: str,
+        sheet_name: str,
+        run_rows: list[tuple[int, dict]],
+    ) -> None:
+        """Sync the queue with a full sheet scan.
+
+        New or changed rows are queued with a fresh attempt count, jobs of
+        rows that are no longer runnable are dropped.
+        """
+        now = time.time()
+        with self.conn:
+            existing = {
+                row_index: (row_hash, status)
+                for row_index, row_hash, status in self.conn.execute(
+                    "SELECT row_index, row_hash, status FROM jobs"
+                    " WHERE sheet_id = ? AND sheet_name = ?",
+                    (sheet_id, sheet_name),
+                )
+            }
+            for index, model_dict in run_rows:
+                new_hash = job_hash(model_dict)
+                current = existing.get(index)
+                if current is not None and current[1] == LEASED:
+                    continue
+                if current is not None and current[0] == new_hash:
+                    # Keep the attempt count and any backoff
+                    self.conn.execute(
+                        "UPDATE jobs SET model_json = ?, updated_at = ?"
+                        " WHERE sheet_id = ? AND sheet_name = ? AND row_index = ?",
+                        (json.dumps(model_dict), now, sheet_id, sheet_name, index),
+                    )
+                    continue
+
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO jobs (sheet_id, sheet_name, row_index,"
+                    " priority, model_json, row_hash, status, attempts, retry_at,"
+                    " updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, 0, NULL, ?)",
+                    (
+                        sheet_id,
+                        sheet_name,
+                        index,
+                        job_priority(model_dict),
+                        json.dumps(model_dict),
+                        new_hash,
+                        PENDING,
+                        now,
+                    ),
+                )
+
+            stale_indexes = set(existing) - {index for index, _ in run_rows}
+            self.conn.executemany(
+                "DELETE FROM jobs WHERE sheet_id = ? AND sheet_name = ?"
+                " AND row_index = ? AND status != ?",
+                [(sheet_id, sheet_name, index, LEASED) for index in stale_indexes],
+            )
+
+    def recover(self) -> int:
+        """Release jobs leased by a previous run, return the pending count."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, leased_until = NULL WHERE status = ?",
+                (PENDING, LEASED),
+            )
+        return self.pending_count()
+
+    def pending_count(self) -> int:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ?", (PENDING,)
+        ).fetchone()[0]
+
+    def backoff_jobs(self) -> list[dict[str, Any]]:
+        """Jobs waiting out a backoff, for the status file."""
+        return [
+            {
+                "sheet_name": sheet_name,
+                "row_index": row_index,
+                "attempts": attempts,
+                "retry_at": retry_at,
+                "last_error": last_error,
+            }
+            for sheet_name, row_index, attempts, retry_at, last_error in (
+                self.conn.execute(
+                    "SELECT sheet_name, row_index, attempts, retry_at, last_error"
+                    " FROM jobs WHERE status = ? AND retry_at > ?"
+                    " ORDER BY sheet_name, row_index",
+                    (PENDING, time.time()),
+                )
+            )
+        ]
+
+    def lease(self, sheet_id: str, sheet_name: str) -> list[Job]:
+        """Lease every due job of a sheet, highest priority first."""
+        now = time.time()
+        with self.conn:
+            rows = self.conn.execute(
+                "SELECT row_index, priority, model_json, attempts, updated_at"
+                " FROM jobs"
+                " WHERE sheet_id = ? AND sheet_name = ?"
+                " AND ((status = ? AND (retry_at IS NULL OR retry_at <= ?))"
+                " OR (status = ? AND leased_until < ?))"
+                " ORDER BY priority, row_index",
+                (sheet_id, sheet_name, PENDING, now, LEASED, now),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET status = ?, leased_until = ?"
+                " WHERE sheet_id = ? AND sheet_name = ? AND row_index = ?",
+                [
+                    (LEASED, now + self.lease_timeout, sheet_id, sheet_name, row[0])
+                    for row in rows
+                ],
+            )
+
+        return [
+            Job(
+                sheet_id=sheet_id,
+                sheet_name=sheet_name,
+                row_index=row_index,
+                priority=priority,
+                model_dict=json.loads(model_json),
+                attempts=attempts,
+                updated_at=updated_at,
+            )
+            for row_index, priority, model_json, attempts, updated_at in rows
+        ]
+
+    def ack(self, jobs: list[Job]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM jobs WHERE sheet_id = ? AND sheet_name = ?"
+                " AND row_index = ? AND status = ?",
+                [(job.sheet_id, job.sheet_name, job.row_index, LEASED) for job in jobs],
+            )
+
+    def fail(self, job: Job, error: str) -> None:
+        attempts = job.attempts + 1
+        retry_at = None
+        if attempts >= self.max_attempts:
+            delay = min(
+                self.retry_delay * 2 ** (attempts - self.max_attempts),
+                self.max_retry_delay,
+            )
+            retry_at = time.time() + delay
+            logger.warning(
+                f"Row {job.row_index} failed {attempts} times, retry in {delay:.0f}s"
+            )
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, leased_until = NULL,"
+                " retry_at = ?, last_error = ?, updated_at = ?"
+                " WHERE sheet_id = ? AND sheet_name = ? AND row_index = ?",
+                (
+                    PENDING,
+                    attempts,
+                    retry_at,
+                    error,
+                    time.time(),
+                    job.sheet_id,
+                    job.sheet_name,
+                    job.row_index,
+                ),
+            )
+
+
+job_queue = lazy(
+    lambda: JobQueue(
+        file_path=ROOT_PATH.joinpath(config.STATE_DB_FILE),
+        max_attempts=config.JOB_MAX_ATTEMPTS,
+        lease_timeout=config.JOB_LEASE_TIMEOUT,
+        retry_delay=config.JOB_RETRY_DELAY,
+        max_retry_delay=config.JOB_MAX_RETRY_DELAY,
+    )
+)
@@ -0,0 +1,51 @@
+"""Lazily created module singletons
+
+function:
+
+    lazy(factory: Callable[[], T]) -> T
+
+Module level singletons (config, logger, API clients, ...) are wrapped with
+`lazy` so importing a module does no real work, the object is built on first
+attribute access and shared afterwards.
+"""
+
+import threading
+from typing import Any, Callable, Generic, TypeVar, cast
+
+T = TypeVar("T")
+
+
+class LazyProxy(Generic[T]):
+    __slots__ = ("_factory", "_instance", "_lock")
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _get(self) -> T:
+        instance = object.__getattribute__(self, "_instance")
+        if instance is None:
+            # Sheets calls run in worker threads, build the object only once
+            with object.__getattribute__(self, "_lock"):
+                instance = object.__getattribute__(self, "_instance")
+                if instance is None:
+                    instance = object.__getattribute__(self, "_factory")()
+                    object.__setattr__(self, "_instance", instance)
+        return instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._get(), name, value)
+
+    def __repr__(self) -> str:
+        instance = object.__getattribute__(self, "_instance")
+        if instance is None:
+            return f"<lazy {object.__getattribute__(self, '_factory')!r}>"
+        return repr(instance)
+
+
+def lazy(factory: Callable[[], T]) -> T:
+    return cast(T, LazyProxy(factory))
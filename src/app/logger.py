@@ -1,7 +1,7 @@
 """App logger and get logger function
 
 object:
-    logger: logging.Logger (entire app logger)
+    logger: logging.Logger (entire app logger, created on first use)
 
 function:
 
@@ -18,6 +18,9 @@ import pathlib
 
 import logging
 
+from .config import config
+from .lazy import lazy
+
 
 def get_logger(
     name: str | None = None,
@@ -48,8 +51,10 @@ def get_logger(
     return logger
 
 
-logger = get_logger(
-    name=os.environ["LOG_NAME"],
-    level=os.environ["LOG_LEVEL"],
-    is_log_file=os.environ["IS_LOG_FILE"].lower() == "true",
+logger = lazy(
+    lambda: get_logger(
+        name=config.LOG_NAME,
+        level=config.LOG_LEVEL,
+        is_log_file=config.IS_LOG_FILE.lower() == "true",
+    )
 )
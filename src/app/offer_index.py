@@ -0,0 +1,63 @@
+from .brw.token import TokenManager
+from .config import config
+from .g2g.crwl_api import async_crwl_g2g_api_client
+from .g2g.models import SellerOffer
+from .lazy import lazy
+from .logger import logger
+from .state import state_store
+
+
+class SellerOfferIndex:
+    """Round snapshot of the seller's offers: offer_id -> status/qty/price.
+
+    Offers missing from the snapshot (or every offer, if the snapshot is
+    disabled or could not be loaded) fall back to a single get_offer call.
+    """
+
+    def __init__(self, enabled: bool, page_size: int, max_pages: int) -> None:
+        self.enabled = enabled
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.offers: dict[str, SellerOffer] = {}
+
+    async def load(self, token_manager: TokenManager) -> None:
+        self.offers = {}
+        if not self.enabled:
+            return
+
+        try:
+            seller_offers = await async_crwl_g2g_api_client.get_all_seller_offers(
+                seller_id=(await token_manager.get_payload()).sub,
+                token=await token_manager.get_token(),
+                page_size=self.page_size,
+                max_pages=self.max_pages,
+            )
+        except Exception as e:
+            logger.error(f"Load seller offers failed: {e}")
+            return
+
+        self.offers = {
+            seller_offer.offer_id: seller_offer for seller_offer in seller_offers
+        }
+        state_store.record_offers(seller_offers)
+        logger.info(f"Loaded {len(self.offers)} seller offers")
+
+    async def get_status(self, offer_id: str, token_manager: TokenManager) -> str:
+        if offer_id in self.offers:
+            return self.offers[offer_id].status
+
+        g2g_offer = (
+            await async_crwl_g2g_api_client.get_offer_status(
+                offer_id=offer_id, token=await token_manager.get_token()
+            )
+        ).payload
+        return g2g_offer.status
+
+
+seller_offer_index = lazy(
+    lambda: SellerOfferIndex(
+        enabled=config.G2G_SELLER_OFFER_INDEX,
+        page_size=config.G2G_SELLER_OFFERS_PAGE_SIZE,
+        max_pages=config.G2G_SELLER_OFFERS_MAX_PAGES,
+    )
+)
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from .logger import logger
+
+
+class PacingScheduler:
+    """Turn row relax values and the round interval into spacing per key.
+
+    A row waits only for earlier work on its own key (service/brand), rows on
+    other keys keep running. Time spent waiting is reported per round.
+    """
+
+    ROUND_KEY = "__round__"
+
+    def __init__(self) -> None:
+        self.next_at: dict[str, float] = {}
+        self.round_started_at = time.monotonic()
+        self.round_wait = 0.0
+        self.slept = 0.0
+        self.waits = 0
+
+    def key(self, key: str | None) -> str:
+        return key if key is not None else ""
+
+    async def wait(self, key: str | None = None) -> float:
+        slept = 0.0
+        # The key may be spaced again by another row while this one sleeps
+        while (delay := self.next_at.get(self.key(key), 0) - time.monotonic()) > 0:
+            logger.info(f"Pace {self.key(key) or 'rows'} for {delay:.2f} seconds")
+            await asyncio.sleep(delay)
+            slept += delay
+
+        if slept > 0:
+            self.slept += slept
+            self.waits += 1
+        return slept
+
+    def is_due(self, key: str | None = None) -> bool:
+        return self.next_at.get(self.key(key), 0) <= time.monotonic()
+
+    def space(self, key: str | None, interval: float) -> None:
+        """Keep the next start on `key` at least `interval` seconds from now."""
+        if interval <= 0:
+            return
+        self.next_at[self.key(key)] = max(
+            self.next_at.get(self.key(key), 0), time.monotonic() + interval
+        )
+
+    async def start_round(self, interval: float) -> None:
+        """Start a round at least `interval` seconds after the previous one."""
+        self.round_wait = await self.wait(self.ROUND_KEY)
+        self.round_started_at = time.monotonic()
+        self.slept = 0.0
+        self.waits = 0
+        self.space(self.ROUND_KEY, interval)
+
+    def round_stats(self) -> dict[str, float | int]:
+        elapsed = time.monotonic() - self.round_started_at
+        return {
+            "round_wait": round(self.round_wait, 2),
+            "elapsed": round(elapsed, 2),
+            "slept": round(self.slept, 2),
+            "waits": self.waits,
+        }
+
+
+pacing_scheduler = PacingScheduler()
@@ -1,7 +1,13 @@
 from datetime import datetime
 
+from httpx import HTTPStatusError
+
 from .sheet.models import SOffer
-from .brw.brw import G2GBrowser
+from .sheet.buffer import sheet_write_buffer
+from .status_batcher import status_batcher
+from .offer_index import seller_offer_index
+from .state import state_store
+from .brw.token import TokenManager
 from .sheet.enums import ProcessType
 from .logger import logger
 from .g2g.models import (
@@ -11,93 +17,92 @@ from .g2g.models import (
     DeliverySpeedDetail,
     SalesTerritorySettings,
     OfferAttribute,
-    Collection,
-    ChildrenCollection,
+    CompactCollection,
     OfferAttributeValue,
 )
-from .brw.utils import decode_jwt
-from .g2g.crwl_api import crwl_g2g_api_client
+from .g2g.crwl_api import async_crwl_g2g_api_client
 from .g2g.enums import OfferStatus, InputField
+from .g2g.exceptions import OfferAttributeMismatchError
 
 from .update_messages import (
     created_offer_message,
     last_update_message,
-    listed_offer_message,
     listed_offer_no_change_message,
     edited_offer_message,
-    delisted_offer_message,
+    edited_offer_no_change_message,
     delisted_offer_no_change_message,
 )
 
 
-def __flatten_children(
-    children_collection: ChildrenCollection,
-) -> dict[str, ChildrenCollection]:
-    tmp_dict: dict[str, ChildrenCollection] = {}
-    if len(children_collection.children) > 0:
-        for child in children_collection.children:
-            tmp_dict.update(__flatten_children(child))
+def __construct_offer_attribute(
+    collection: CompactCollection,
+    attribute_value: str,
+) -> OfferAttribute:
+    collection_index = collection.index()
+    offer_attribute = collection_index.lookup(attribute_value)
+    if offer_attribute is not None:
+        return offer_attribute
 
-    else:
-        tmp_dict[children_collection.dataset_id] = children_collection
+    raise OfferAttributeMismatchError(
+        f"Attribute {collection.value} only accepts {collection_index.accepted_values}. You input {attribute_value}"
+    )
 
-    return tmp_dict
 
+def invalidate_collections(s_offer: SOffer) -> None:
+    url_query = URlQuery.from_url(s_offer.Create_offer_link)
+    async_crwl_g2g_api_client.invalidate_collections(
+        service_id=url_query.service_id,
+        brand_id=url_query.brand_id,
+        region_id=url_query.region_id,
+    )
 
-def __construct_offer_attribute(
-    collection: Collection,
-    attribute_value: str,
-) -> OfferAttribute:
-    accepted_attribute_values: set[str] = set()
-    for children in collection.children:
-        for child in __flatten_children(children).values():
-            accepted_attribute_values.add(child.value)
-            if attribute_value.strip().lower() == child.value.strip().lower():
-                return OfferAttribute(
-                    collection_id=child.collection_id, dataset_id=child.dataset_id
-                )
 
-    raise Exception(
-        f"Attribute {collection.value} only accepts {list(accepted_attribute_values)}. You input {attribute_value}"
+def is_attribute_rejection(e: HTTPStatusError) -> bool:
+    return (
+        e.response.status_code in (400, 422) and "attribute" in e.response.text.lower()
     )
 
 
-def construct_offer_attributes(
+async def construct_offer_attributes(
     s_offer: SOffer,
 ) -> list[OfferAttribute | OfferAttributeValue]:
     url_query = URlQuery.from_url(s_offer.Create_offer_link)
 
-    collections = crwl_g2g_api_client.get_collections(
-        service_id=url_query.service_id,
-        brand_id=url_query.brand_id,
-        region_id=url_query.region_id,
+    collections = (
+        await async_crwl_g2g_api_client.get_collections(
+            service_id=url_query.service_id,
+            brand_id=url_query.brand_id,
+            region_id=url_query.region_id,
+        )
     ).payload.results
 
     sorted_collections = sorted(collections, key=lambda x: x.sort_order)
 
     attribute_values = s_offer.get_attribute_dist()
 
-    final_collections: list[Collection] = []
+    final_collections: list[CompactCollection] = []
 
     # Find DPD Collection if existed
     for collection in sorted_collections:
         final_collections.append(collection)
-        for child in collection.children:
-            if (
-                child.value == attribute_values[len(final_collections)]
-                and len(child.dpd_collections) > 0
-            ):
-                collections_attributes_search = crwl_g2g_api_client.attributes_search(
-                    [
-                        dpd_collection.collection_id
-                        for dpd_collection in child.dpd_collections
-                    ]
-                ).payload.results
-
-                collections_attributes_search = sorted(
-                    collections_attributes_search, key=lambda x: x.sort_order
+        # Optional attributes may be left blank
+        attribute_value = attribute_values.get(len(final_collections))
+        dpd_collections = (
+            collection.index().dpd_collections.get(attribute_value)
+            if attribute_value
+            else None
+        )
+        if dpd_collections:
+            collections_attributes_search = (
+                await async_crwl_g2g_api_client.get_dpd_collections(
+                    [dpd_collection.collection_id for dpd_collection in dpd_collections]
                 )
-                final_collections.extend(collections_attributes_search)
+            )
+
+            collections_attributes_search = sorted(
+                collections_attributes_search, key=lambda x: x.sort_order
+            )
+            final_collections.extend(collections_attributes_search)
 
     offer_attributes: list[OfferAttribute | OfferAttributeValue] = []
 
@@ -110,9 +115,14 @@ def construct_offer_attributes(
 
     for i, collection in enumerate(final_collections):
         if collection.input_field == InputField.DROPDOWN:
-            offer_attributes.append(
-                __construct_offer_attribute(collection, attribute_values[i + 1])
-            )
+            try:
+                offer_attributes.append(
+                    __construct_offer_attribute(collection, attribute_values[i + 1])
+                )
+            except OfferAttributeMismatchError:
+                # The cached collection tree may be stale
+                invalidate_collections(s_offer)
+                raise
         else:
             if not collection.is_required and not attribute_values.get(i + 1):
                 continue
@@ -126,13 +136,66 @@ def construct_offer_attributes(
     return offer_attributes
 
 
+def need_offer_payload(s_offer: SOffer) -> bool:
+    return (s_offer.Check == ProcessType.LIST.value and not s_offer.Offer_ID) or (
+        s_offer.Check == ProcessType.EDIT.value
+        and bool(s_offer.Offer_ID)
+        and not state_store.is_payload_unchanged(s_offer)
+    )
+
+
+async def dpd_collection_id_groups(
+    s_offer: SOffer,
+) -> list[list[str]]:
+    url_query = URlQuery.from_url(s_offer.Create_offer_link)
+
+    collections = (
+        await async_crwl_g2g_api_client.get_collections(
+            service_id=url_query.service_id,
+            brand_id=url_query.brand_id,
+            region_id=url_query.region_id,
+        )
+    ).payload.results
+
+    attribute_values = s_offer.get_attribute_dist()
+
+    # Same walk as construct_offer_attributes, assuming one DPD collection per id
+    position = 0
+    groups: list[list[str]] = []
+    for collection in sorted(collections, key=lambda x: x.sort_order):
+        position += 1
+        dpd_collections = collection.index().dpd_collections.get(
+            attribute_values.get(position, "")
+        )
+        if dpd_collections:
+            group = [dpd_collection.collection_id for dpd_collection in dpd_collections]
+            groups.append(group)
+            position += len(group)
+
+    return groups
+
+
+async def prefetch_offer_attributes(s_offers: list[SOffer]) -> None:
+    groups: list[list[str]] = []
+    for s_offer in s_offers:
+        if not need_offer_payload(s_offer):
+            continue
+        try:
+            groups.extend(await dpd_collection_id_groups(s_offer))
+        except Exception as e:
+            logger.warning(f"Prefetch attributes failed at row {s_offer.index}: {e}")
+
+    try:
+        await async_crwl_g2g_api_client.prefetch_dpd_collections(groups)
+    except Exception as e:
+        logger.warning(f"Prefetch DPD collections failed: {e}")
+
+
 async def prepare_create_offer_payload(
-    brw: G2GBrowser,
+    token_manager: TokenManager,
     s_offer: SOffer,
 ) -> CreateOfferPayload:
-    token = await brw.get_access_token_in_safe()
-
-    decoded_jwt = decode_jwt(token)
+    decoded_jwt = await token_manager.get_payload()
 
     seller_id: str = decoded_jwt.sub
 
@@ -162,7 +225,7 @@ async def prepare_create_offer_payload(
         low_stock_alert_qty=0,
         sales_territory_settings=sales_territory_settings,
         title=s_offer.title,
-        offer_attributes=construct_offer_attributes(s_offer),
+        offer_attributes=await construct_offer_attributes(s_offer),
         external_images_mapping=external_image_mappings,
         unit_price=s_offer.unit_price,
         other_pricing=[],
@@ -176,128 +239,147 @@ async def prepare_create_offer_payload(
 
 
 async def main_flow(
-    brw: G2GBrowser,
+    token_manager: TokenManager,
     s_offer: SOffer,
 ):
     try:
         if s_offer.Check == ProcessType.LIST.value:
-            return await list_flow(brw, s_offer)
+            return await list_flow(token_manager, s_offer)
 
         if s_offer.Check == ProcessType.EDIT.value:
-            return await edit_flow(brw, s_offer)
+            return await edit_flow(token_manager, s_offer)
 
         if s_offer.Check == ProcessType.DELIST.value:
-            return await delist_flow(brw, s_offer)
+            return await delist_flow(token_manager, s_offer)
     except Exception as e:
         raise Exception(str(e))
 
 
-async def create_offer_flow(brw: G2GBrowser, s_offer: SOffer):
+async def create_offer_flow(token_manager: TokenManager, s_offer: SOffer):
     logger.info("Create offer")
 
-    create_offer_payload = await prepare_create_offer_payload(brw, s_offer)
+    # Created before but the sheet write was lost, do not create it twice
+    journaled_offer_id = state_store.journaled_offer_id(s_offer, "create")
+    if journaled_offer_id is not None:
+        logger.info(f"Offer {journaled_offer_id} already created for this row")
+        now = datetime.now()
+        s_offer.Offer_ID = journaled_offer_id
+        s_offer.Note = created_offer_message(now)
+        s_offer.Timeline = last_update_message(now)
+        await sheet_write_buffer.add(s_offer)
+        return
+
+    create_offer_payload = await prepare_create_offer_payload(token_manager, s_offer)
 
     # print(create_offer_payload.model_dump_json())
     # return
 
-    token = await brw.get_access_token_in_safe()
-    created_offer = crwl_g2g_api_client.create_offer(
-        payload=create_offer_payload,
-        token=token,
-    ).payload
+    token = await token_manager.get_token()
+    try:
+        created_offer = (
+            await async_crwl_g2g_api_client.create_offer(
+                payload=create_offer_payload,
+                token=token,
+            )
+        ).payload
+    except HTTPStatusError as e:
+        if is_attribute_rejection(e):
+            invalidate_collections(s_offer)
+        raise
 
     now = datetime.now()
 
     s_offer.Offer_ID = created_offer.offer_id
+    state_store.record_payload(s_offer)
     s_offer.Note = created_offer_message(now)
     s_offer.Timeline = last_update_message(now)
 
-    s_offer.update()
+    state_store.journal(s_offer, "create")
+    await sheet_write_buffer.add(s_offer)
 
 
 async def list_flow(
-    brw: G2GBrowser,
+    token_manager: TokenManager,
     s_offer: SOffer,
 ):
     logger.info("LIST flow")
     if not s_offer.Offer_ID:
-        return await create_offer_flow(brw=brw, s_offer=s_offer)
-
-    token = await brw.get_access_token_in_safe()
-    g2g_offer = crwl_g2g_api_client.get_offer(
-        offer_id=s_offer.Offer_ID, token=token
-    ).payload
-    if g2g_offer.status != OfferStatus.LIVE.value:
-        logger.info("Change offer status to live")
-        crwl_g2g_api_client.bulk_update(
-            offer_id=s_offer.Offer_ID,
-            status=OfferStatus.LIVE.value,
-            token=token,
-            user_id=decode_jwt(token).sub,
-        )
-        now = datetime.now()
-        s_offer.Timeline = last_update_message(now)
-        s_offer.Note = listed_offer_message(now)
-        s_offer.update()
+        return await create_offer_flow(token_manager=token_manager, s_offer=s_offer)
+
+    offer_status = await seller_offer_index.get_status(s_offer.Offer_ID, token_manager)
+    if offer_status != OfferStatus.LIVE.value:
+        logger.info("Queue offer status change to live")
+        status_batcher.add(s_offer, OfferStatus.LIVE)
     else:
         logger.info("Offer listed. No need to change")
+        state_store.record(s_offer, offer_status)
         now = datetime.now()
         s_offer.Timeline = last_update_message(now)
         s_offer.Note = listed_offer_no_change_message(now)
-        s_offer.update()
+        await sheet_write_buffer.add(s_offer)
 
 
 async def edit_flow(
-    brw: G2GBrowser,
+    token_manager: TokenManager,
     s_offer: SOffer,
 ):
     logger.info("EDIT Flow")
-    if s_offer.Offer_ID:
-        create_offer_payload = await prepare_create_offer_payload(brw, s_offer)
+    if s_offer.Offer_ID and state_store.is_payload_unchanged(s_offer):
+        logger.info("Offer payload unchanged. No need to update")
+        now = datetime.now()
+        s_offer.Note = edited_offer_no_change_message(now)
+        s_offer.Timeline = last_update_message(now)
+        await sheet_write_buffer.add(s_offer)
+    elif s_offer.Offer_ID:
+        create_offer_payload = await prepare_create_offer_payload(
+            token_manager, s_offer
+        )
 
-        token = await brw.get_access_token_in_safe()
-        _ = crwl_g2g_api_client.update_offer(
-            offer_id=s_offer.Offer_ID,
-            payload=create_offer_payload,
-            token=token,
-        ).payload
+        token = await token_manager.get_token()
+        try:
+            _ = (
+                await async_crwl_g2g_api_client.update_offer(
+                    offer_id=s_offer.Offer_ID,
+                    payload=create_offer_payload,
+                    token=token,
+                )
+            ).payload
+        except HTTPStatusError as e:
+            if is_attribute_rejection(e):
+                invalidate_collections(s_offer)
+            raise
 
+        state_store.record_payload(s_offer)
         now = datetime.now()
 
         s_offer.Note = edited_offer_message(now)
         s_offer.Timeline = last_update_message(now)
 
-        s_offer.update()
+        state_store.journal(s_offer, "edit")
+        await sheet_write_buffer.add(s_offer)
     else:
         raise Exception("Must include Offer ID to edit")
 
 
 async def delist_flow(
-    brw: G2GBrowser,
+    token_manager: TokenManager,
     s_offer: SOffer,
 ):
     logger.info("DELIST Flow")
     if s_offer.Offer_ID:
-        token = await brw.get_access_token_in_safe()
-        g2g_offer = crwl_g2g_api_client.get_offer(s_offer.Offer_ID, token=token).payload
-        if g2g_offer.status == OfferStatus.DELISTED.value:
+        offer_status = await seller_offer_index.get_status(
+            s_offer.Offer_ID, token_manager
+        )
+        if offer_status == OfferStatus.DELISTED.value:
             logger.info("Offer delisted. No need to change")
+            state_store.record(s_offer, offer_status)
             now = datetime.now()
             s_offer.Timeline = last_update_message(now)
             s_offer.Note = delisted_offer_no_change_message(now)
-            s_offer.update()
+            await sheet_write_buffer.add(s_offer)
         else:
-            logger.info("Change offer status to delist")
-            crwl_g2g_api_client.bulk_update(
-                offer_id=s_offer.Offer_ID,
-                status=OfferStatus.DELISTED.value,
-                token=token,
-                user_id=decode_jwt(token).sub,
-            )
-            now = datetime.now()
-            s_offer.Timeline = last_update_message(now)
-            s_offer.Note = delisted_offer_message(now)
-            s_offer.update()
+            logger.info("Queue offer status change to delist")
+            status_batcher.add(s_offer, OfferStatus.DELISTED)
 
     else:
         raise Exception("Must include Offer ID to delist")
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from typing import Any
+
+from gspread.utils import column_letter_to_index
+
+from ..config import config
+from ..lazy import lazy
+from ..logger import logger
+from .models import ColSheetModel
+
+
+class SheetWriteBuffer:
+    """Collect row updates and write them with one batch_update per sheet.
+
+    A flush happens once `max_rows` rows are pending or `flush_interval`
+    seconds have passed since the previous flush, and whenever `flush` is
+    called explicitly (e.g. at the end of a round).
+    """
+
+    def __init__(
+        self,
+        max_rows: int,
+        flush_interval: float,
+    ) -> None:
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.pending: dict[tuple[str, str], dict[tuple[int, int], Any]] = {}
+        self.last_flush_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def pending_rows(self) -> int:
+        return sum(len({row for row, _ in cells}) for cells in self.pending.values())
+
+    async def add(self, s_object: ColSheetModel) -> None:
+        cells = s_object.to_cells(only_dirty=True)
+        s_object.mark_clean()
+        if len(cells) == 0:
+            return
+
+        await self.add_cells(
+            sheet_id=s_object.sheet_id,
+            sheet_name=s_object.sheet_name,
+            cells=cells,
+        )
+
+    async def add_cell(
+        self,
+        sheet_id: str,
+        sheet_name: str,
+        index: int,
+        col: str,
+        value: Any,
+    ) -> None:
+        await self.add_cells(
+            sheet_id=sheet_id,
+            sheet_name=sheet_name,
+            cells={(index, column_letter_to_index(col)): value},
+        )
+
+    async def add_cells(
+        self,
+        sheet_id: str,
+        sheet_name: str,
+        cells: dict[tuple[int, int], Any],
+    ) -> None:
+        self.pending.setdefault((sheet_id, sheet_name), {}).update(cells)
+
+        if (
+            self.pending_rows() >= self.max_rows
+            or time.monotonic() - self.last_flush_at >= self.flush_interval
+        ):
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush_at = time.monotonic()
+
+            for (sheet_id, sheet_name), cells in pending.items():
+                if len(cells) == 0:
+                    continue
+                logger.info(f"Flush {len(cells)} cells to sheet {sheet_name}")
+                try:
+                    await asyncio.to_thread(
+                        ColSheetModel.update_cells,
+                        sheet_id=sheet_id,
+                        sheet_name=sheet_name,
+                        cells=cells,
+                    )
+                except Exception as e:
+                    logger.error(f"Flush to sheet {sheet_name} failed: {e}")
+                    # Keep the cells for the next flush, newer values win
+                    self.pending[(sheet_id, sheet_name)] = cells | self.pending.get(
+                        (sheet_id, sheet_name), {}
+                    )
+
+
+sheet_write_buffer = lazy(
+    lambda: SheetWriteBuffer(
+        max_rows=config.SHEET_WRITE_BATCH_ROWS,
+        flush_interval=config.SHEET_WRITE_FLUSH_INTERVAL,
+    )
+)
@@ -1,6 +1,12 @@
 from ..paths import ROOT_PATH
 from ..config import config
+from ..lazy import lazy
+from .rate_limit import RateLimitedHTTPClient
 
 from gspread import service_account
 
-gsheet_client = service_account(ROOT_PATH.joinpath(config.KEYS_PATH))
+gsheet_client = lazy(
+    lambda: service_account(
+        ROOT_PATH.joinpath(config.KEYS_PATH), http_client=RateLimitedHTTPClient
+    )
+)
@@ -1,10 +1,12 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Annotated, Self, Final
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+from typing import Annotated, Any, Self, Final
 from gspread.worksheet import Worksheet
+from gspread.utils import column_letter_to_index
 
 from .g_sheet import gsheet_client
 from ..decorators import retry_on_fail
 from .enums import ProcessType
+from .utils import merge_cell_updates
 
 
 COL_META_FIELD_NAME: Final[str] = "col_name_xxx"
@@ -18,6 +20,24 @@ class ColSheetModel(BaseModel):
     sheet_name: str
     index: int
 
+    # Mapped field values as they were loaded (or last written)
+    _clean_values: dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context: Any) -> None:
+        self.mark_clean()
+
+    def mark_clean(self) -> None:
+        model_dict = self.model_dump(mode="json")
+        self._clean_values = {k: model_dict[k] for k in self.mapping_fields()}
+
+    def dirty_fields(self) -> list[str]:
+        model_dict = self.model_dump(mode="json")
+        return [
+            k
+            for k in self.mapping_fields()
+            if k not in self._clean_values or model_dict[k] != self._clean_values[k]
+        ]
+
     @classmethod
     def get_worksheet(
         cls,
@@ -113,55 +133,107 @@ class ColSheetModel(BaseModel):
         return result_list
 
     @classmethod
-    @retry_on_fail(max_retries=3, sleep_interval=30)
+    @retry_on_fail(max_retries=3, sleep_interval=5)
+    def get_snapshot(
+        cls,
+        sheet_id: str,
+        sheet_name: str,
+        start_index: int = 1,
+    ) -> list[tuple[int, dict]]:
+        """Read every mapped column of the sheet in a single values request.
+
+        Rows are returned as raw model dicts (not validated) together with their
+        row number, so callers can validate and report errors row by row.
+        """
+        mapping_dict = cls.mapping_fields()
+        col_indexes = {k: column_letter_to_index(v) for k, v in mapping_dict.items()}
+
+        first_field = min(col_indexes, key=lambda k: col_indexes[k])
+        last_field = max(col_indexes, key=lambda k: col_indexes[k])
+        first_col_index = col_indexes[first_field]
+
+        worksheet = cls.get_worksheet(sheet_id=sheet_id, sheet_name=sheet_name)
+        query_results = worksheet.get(
+            f"{mapping_dict[first_field]}{start_index}:{mapping_dict[last_field]}"
+        )
+
+        snapshot: list[tuple[int, dict]] = []
+        for offset, row in enumerate(query_results):
+            index = start_index + offset
+            model_dict = {
+                "index": index,
+                "sheet_id": sheet_id,
+                "sheet_name": sheet_name,
+            }
+            for k, col_index in col_indexes.items():
+                position = col_index - first_col_index
+                value = row[position] if position < len(row) else None
+                if value == "":
+                    value = None
+                if isinstance(value, str):
+                    value = value.strip()
+                model_dict[k] = value
+            snapshot.append((index, model_dict))
+
+        return snapshot
+
+    @classmethod
     def batch_update(
         cls,
         sheet_id: str,
         sheet_name: str,
         list_object: list[Self],
+    ) -> None:
+        cells: dict[tuple[int, int], Any] = {}
+        for object in list_object:
+            cells.update(object.to_cells(only_dirty=True))
+
+        if len(cells) > 0:
+            cls.update_cells(sheet_id=sheet_id, sheet_name=sheet_name, cells=cells)
+
+        for object in list_object:
+            object.mark_clean()
+
+    @classmethod
+    @retry_on_fail(max_retries=3, sleep_interval=5)
+    def update_cells(
+        cls,
+        sheet_id: str,
+        sheet_name: str,
+        cells: dict[tuple[int, int], Any],
     ) -> None:
         worksheet = cls.get_worksheet(
             sheet_id=sheet_id,
             sheet_name=sheet_name,
         )
-        mapping_dict = cls.mapping_fields()
-        update_batch = []
-
-        for object in list_object:
-            model_dict = object.model_dump(mode="json")
+        worksheet.batch_update(merge_cell_updates(cells))
 
-            for k, v in mapping_dict.items():
-                update_batch.append(
-                    {
-                        "range": f"{v}{object.index}",
-                        "values": [[model_dict[k]]],
-                    }
-                )
+    def to_cells(
+        self,
+        only_dirty: bool = False,
+    ) -> dict[tuple[int, int], Any]:
+        mapping_dict = self.mapping_fields()
+        model_dict = self.model_dump(mode="json")
+        fields = self.dirty_fields() if only_dirty else list(mapping_dict)
 
-        if len(list_object) > 0:
-            worksheet.batch_update(update_batch)
+        return {
+            (self.index, column_letter_to_index(mapping_dict[k])): model_dict[k]
+            for k in fields
+        }
 
-    @retry_on_fail(max_retries=3, sleep_interval=30)
     def update(
         self,
     ) -> None:
-        mapping_dict = self.mapping_fields()
-        model_dict = self.model_dump(mode="json")
-
-        worksheet = self.get_worksheet(
-            sheet_id=self.sheet_id, sheet_name=self.sheet_name
+        cells = self.to_cells(only_dirty=True)
+        if len(cells) == 0:
+            return
+
+        self.update_cells(
+            sheet_id=self.sheet_id,
+            sheet_name=self.sheet_name,
+            cells=cells,
         )
-
-        update_batch = []
-        for k, v in mapping_dict.items():
-            update_batch.append(
-                {
-                    "range": f"{v}{self.index}",
-                    "values": [[model_dict[k]]],
-                }
-            )
-
-        worksheet.batch_update(update_batch)
+        self.mark_clean()
 
 
 class SOffer(ColSheetModel):
@@ -205,6 +277,22 @@ class SOffer(ColSheetModel):
                 attributes[i] = getattr(self, f"attribute_{i}")
         return attributes
 
+    @classmethod
+    def get_run_snapshot(
+        cls,
+        sheet_id: str,
+        sheet_name: str,
+        start_index: int = 1,
+    ) -> list[tuple[int, dict]]:
+        process_types = [type.value for type in ProcessType]
+        return [
+            (index, model_dict)
+            for index, model_dict in cls.get_snapshot(
+                sheet_id=sheet_id, sheet_name=sheet_name, start_index=start_index
+            )
+            if model_dict["Check"] in process_types
+        ]
+
     @staticmethod
     def get_run_indexes(sheet_id: str, sheet_name: str, col_index: int) -> list[int]:
         sheet = SOffer.get_worksheet(sheet_id=sheet_id, sheet_name=sheet_name)
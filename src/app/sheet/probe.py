@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import json
+import time
+
+from gspread.urls import DRIVE_FILES_API_V3_URL
+from pydantic import BaseModel
+
+from ..config import config
+from ..job_queue import job_hash
+from ..lazy import lazy
+from ..logger import logger
+from .g_sheet import gsheet_client
+from .models import SOffer
+
+
+class DriveState(BaseModel):
+    modified_time: str
+    # Whether the last change was made by this service account
+    modified_by_me: bool
+
+
+class Baseline(BaseModel):
+    modified_time: str
+    rows_hash: str
+
+
+def rows_hash(run_rows: list[tuple[int, dict]]) -> str:
+    return hashlib.sha256(
+        json.dumps(
+            [[index, job_hash(model_dict)] for index, model_dict in run_rows]
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+class SheetChangeProbe:
+    """Decide whether a round needs the full sheet read.
+
+    The baseline is the spreadsheet's Drive modified time taken right before a
+    round reads its snapshot, plus a hash of that snapshot's runnable rows.
+    A newer modified time by someone else means the sheet changed. When only
+    our own writes are newer, the runnable rows are read again and compared
+    to the hash, as an edit made during the round may sit behind them.
+    """
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_interval: float,
+        full_round_interval: float,
+    ) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.full_round_interval = full_round_interval
+        self.interval = min_interval
+        self.baselines: dict[str, Baseline] = {}
+        self.pending: dict[str, Baseline] = {}
+        self.last_full_round_at: float | None = None
+
+    def drive_state(self, sheet_id: str) -> DriveState | None:
+        try:
+            metadata = gsheet_client.http_client.request(
+                "get",
+                f"{DRIVE_FILES_API_V3_URL}/{sheet_id}",
+                params={
+                    "supportsAllDrives": True,
+                    "fields": "modifiedTime,lastModifyingUser(me)",
+                },
+            ).json()
+            return DriveState(
+                modified_time=metadata["modifiedTime"],
+                modified_by_me=metadata.get("lastModifyingUser", {}).get("me", False),
+            )
+        except Exception as e:
+            logger.warning(f"Sheet change probe failed: {e}")
+            return None
+
+    def run_snapshot(self, sheet_id: str, sheet_name: str) -> list[tuple[int, dict]]:
+        return SOffer.get_run_snapshot(sheet_id, sheet_name)
+
+    async def read_snapshot(
+        self, sheet_id: str, sheet_name: str
+    ) -> list[tuple[int, dict]]:
+        """Read the runnable rows of a round and keep them as the next baseline.
+
+        The baseline only takes effect on `commit`.
+        """
+        drive_state = await asyncio.to_thread(self.drive_state, sheet_id)
+        run_rows = await asyncio.to_thread(self.run_snapshot, sheet_id, sheet_name)
+        if drive_state is None:
+            self.pending.pop(sheet_id, None)
+        else:
+            self.pending[sheet_id] = Baseline(
+                modified_time=drive_state.modified_time, rows_hash=rows_hash(run_rows)
+            )
+        return run_rows
+
+    async def has_changed(self, sheet_id: str, sheet_name: str) -> bool:
+        if (
+            self.last_full_round_at is None
+            or time.monotonic() - self.last_full_round_at >= self.full_round_interval
+        ):
+            return True
+
+        baseline = self.baselines.get(sheet_id)
+        if baseline is None:
+            return True
+
+        drive_state = await asyncio.to_thread(self.drive_state, sheet_id)
+        if drive_state is None:
+            return True
+
+        if drive_state.modified_time != baseline.modified_time:
+            if not drive_state.modified_by_me:
+                return True
+
+            # Our writes moved the modified time, the rows tell if anyone else
+            # edited before them
+            try:
+                run_rows = await asyncio.to_thread(
+                    self.run_snapshot, sheet_id, sheet_name
+                )
+            except Exception as e:
+                logger.warning(f"Sheet change probe failed: {e}")
+                return True
+            if rows_hash(run_rows) != baseline.rows_hash:
+                return True
+            self.baselines[sheet_id] = Baseline(
+                modified_time=drive_state.modified_time, rows_hash=baseline.rows_hash
+            )
+
+        # A zero round interval would never grow
+        self.interval = min(max(self.interval, 1) * 2, self.max_interval)
+        logger.info(f"Sheet unchanged. Next probe in {self.interval} seconds")
+        return False
+
+    def invalidate(self, sheet_id: str) -> None:
+        self.baselines.pop(sheet_id, None)
+        self.pending.pop(sheet_id, None)
+
+    def commit(self, sheet_id: str, rerun: bool = False) -> None:
+        """Keep the snapshot of a finished round as the baseline.
+
+        `rerun` keeps the next round a full one, e.g. when rows failed.
+        """
+        self.last_full_round_at = time.monotonic()
+        self.interval = self.min_interval
+        baseline = self.pending.pop(sheet_id, None)
+        if rerun or baseline is None:
+            self.invalidate(sheet_id)
+        else:
+            self.baselines[sheet_id] = baseline
+
+
+sheet_change_probe = lazy(
+    lambda: SheetChangeProbe(
+        min_interval=config.RELAX_TIME_EACH_ROUND,
+        max_interval=config.SHEET_PROBE_MAX_INTERVAL,
+        full_round_interval=config.SHEET_PROBE_FULL_ROUND_INTERVAL,
+    )
+)
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from gspread.http_client import HTTPClient
+
+from ..config import config
+from ..lazy import lazy
+from ..logger import logger
+
+
+class TokenBucket:
+    """Thread safe token bucket refilled at `rate_per_minute`.
+
+    `capacity` bounds the burst size, so in any minute at most
+    `rate_per_minute + capacity` tokens are handed out.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float) -> None:
+        self.rate = rate_per_minute / 60
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.acquired_at: deque[float] = deque()
+        self.total_wait = 0.0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Return the wait."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.acquired_at.append(now)
+                    self.total_wait += waited
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+    def usage(self) -> dict[str, Any]:
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            while self.acquired_at and now - self.acquired_at[0] > 60:
+                self.acquired_at.popleft()
+            return {
+                "rate_per_minute": round(self.rate * 60, 2),
+                "used_last_minute": len(self.acquired_at),
+                "available": round(self.tokens, 2),
+                "total_wait": round(self.total_wait, 2),
+            }
+
+
+class SheetsRateLimiter:
+    """Separate read and write budgets for the Google Sheets API."""
+
+    def __init__(
+        self,
+        read_per_minute: float,
+        write_per_minute: float,
+        burst: float,
+    ) -> None:
+        self.read_bucket = TokenBucket(read_per_minute, burst)
+        self.write_bucket = TokenBucket(write_per_minute, burst)
+
+    @staticmethod
+    def is_read(method: str, endpoint: str) -> bool:
+        return method.upper() == "GET" or "batchGet" in endpoint
+
+    def acquire(self, method: str, endpoint: str) -> None:
+        is_read = self.is_read(method, endpoint)
+        bucket = self.read_bucket if is_read else self.write_bucket
+        waited = bucket.acquire()
+        if waited > 0:
+            logger.info(
+                f"Sheets {'read' if is_read else 'write'} budget: waited {waited:.1f}s"
+            )
+
+    def usage(self) -> dict[str, dict[str, Any]]:
+        return {
+            "read": self.read_bucket.usage(),
+            "write": self.write_bucket.usage(),
+        }
+
+
+sheets_rate_limiter = lazy(
+    lambda: SheetsRateLimiter(
+        read_per_minute=config.SHEETS_READ_PER_MINUTE,
+        write_per_minute=config.SHEETS_WRITE_PER_MINUTE,
+        burst=config.SHEETS_BURST,
+    )
+)
+
+
+class RateLimitedHTTPClient(HTTPClient):
+    """gspread HTTP client that takes a token from the shared limiter first."""
+
+    def request(self, method: str, endpoint: str, *args, **kwargs):
+        sheets_rate_limiter.acquire(method, endpoint)
+        return super().request(method, endpoint, *args, **kwargs)
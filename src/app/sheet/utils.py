@@ -0,0 +1,50 @@
+from typing import Any
+
+from gspread.utils import rowcol_to_a1
+
+
+def merge_cell_updates(
+    cells: dict[tuple[int, int], Any],
+) -> list[dict]:
+    """Merge single cell updates into contiguous A1 blocks.
+
+    Cells are keyed by (row, col). Adjacent cells of a row are merged into one
+    run, then runs covering the same columns on consecutive rows are stacked
+    into one rectangular block.
+    """
+    row_runs: list[tuple[int, int, int, list[Any]]] = []
+    for row, col in sorted(cells):
+        if row_runs:
+            last_row, start_col, end_col, values = row_runs[-1]
+            if last_row == row and end_col + 1 == col:
+                values.append(cells[(row, col)])
+                row_runs[-1] = (last_row, start_col, col, values)
+                continue
+        row_runs.append((row, col, col, [cells[(row, col)]]))
+
+    blocks: list[tuple[int, int, int, int, list[list[Any]]]] = []
+    for row, start_col, end_col, values in sorted(
+        row_runs, key=lambda run: (run[1], run[2], run[0])
+    ):
+        if blocks:
+            start_row, last_row, block_start_col, block_end_col, block_values = blocks[
+                -1
+            ]
+            if (
+                block_start_col == start_col
+                and block_end_col == end_col
+                and last_row + 1 == row
+            ):
+                block_values.append(values)
+                blocks[-1] = (start_row, row, start_col, end_col, block_values)
+                continue
+        blocks.append((row, row, start_col, end_col, [values]))
+
+    update_batch = []
+    for start_row, end_row, start_col, end_col, values in blocks:
+        a1_range = rowcol_to_a1(start_row, start_col)
+        if (start_row, start_col) != (end_row, end_col):
+            a1_range = f"{a1_range}:{rowcol_to_a1(end_row, end_col)}"
+        update_batch.append({"range": a1_range, "values": values})
+
+    return update_batch
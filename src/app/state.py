@@ -0,0 +1,359 @@
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+from .config import config
+from .db import connect
+from .g2g.enums import OfferStatus
+from .g2g.models import SellerOffer
+from .lazy import lazy
+from .paths import ROOT_PATH
+from .sheet.enums import ProcessType
+from .sheet.models import SOffer
+
+# Columns written by the tool itself, they do not change what a row asks for
+ROW_HASH_EXCLUDE_FIELDS: set[str] = {"Note", "Timeline"}
+# Columns that are not part of the offer payload
+PAYLOAD_HASH_EXCLUDE_FIELDS: set[str] = {
+    "Check",
+    "Note",
+    "Timeline",
+    "Offer_ID",
+    "ADMIN",
+    "SELLER",
+    "relax",
+}
+
+TARGET_STATUSES: dict[str, str] = {
+    ProcessType.LIST.value: OfferStatus.LIVE.value,
+    ProcessType.DELIST.value: OfferStatus.DELISTED.value,
+}
+
+
+def fields_hash(s_offer: SOffer, exclude_fields: set[str]) -> str:
+    model_dict = s_offer.model_dump(
+        mode="json",
+        include=set(s_offer.mapping_fields()) - exclude_fields,
+    )
+    return hashlib.sha256(
+        json.dumps(model_dict, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def row_hash(s_offer: SOffer) -> str:
+    return fields_hash(s_offer, ROW_HASH_EXCLUDE_FIELDS)
+
+
+def payload_hash(s_offer: SOffer) -> str:
+    return fields_hash(s_offer, PAYLOAD_HASH_EXCLUDE_FIELDS)
+
+
+class JournalEntry(BaseModel):
+    id: int
+    sheet_id: str
+    sheet_name: str
+    row_index: int
+    offer_id: str
+    kind: str
+    cells: dict[tuple[int, int], Any]
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    sheet_id TEXT NOT NULL,
+    sheet_name TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    offer_id TEXT,
+    row_hash TEXT,
+    status TEXT,
+    checked_at REAL,
+    last_error TEXT,
+    error_at REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (sheet_id, sheet_name, row_index)
+);
+CREATE TABLE IF NOT EXISTS offers (
+    offer_id TEXT PRIMARY KEY,
+    payload_hash TEXT,
+    synced_at REAL,
+    status TEXT,
+    available_qty INTEGER,
+    unit_price REAL,
+    seen_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sheet_id TEXT NOT NULL,
+    sheet_name TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    offer_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload_hash TEXT,
+    cells_json TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    applied_at REAL
+);
+CREATE INDEX IF NOT EXISTS journal_pending ON journal (applied_at, sheet_id, sheet_name, row_index);
+"""
+
+
+class StateStore:
+    """Local mirror of rows, offers and their last sync with G2G, in SQLite.
+
+    A LIST/DELIST row is skipped when its content is unchanged and its offer
+    was last seen in the target status less than `revalidate_interval`
+    seconds ago. In the same way an EDIT is skipped when the row inputs hash
+    to the payload last sent for its offer.
+
+    Every successful G2G mutation is journaled with the cells it puts on the
+    sheet before they are queued for writing. Entries not yet on the sheet
+    are replayed instead of repeating the mutation.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        revalidate_interval: float,
+    ) -> None:
+        self.file_path = file_path
+        self.revalidate_interval = revalidate_interval
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.file_path)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def should_skip(self, s_offer: SOffer) -> bool:
+        target_status = TARGET_STATUSES.get(s_offer.Check)
+        if target_status is None or not s_offer.Offer_ID:
+            return False
+
+        state = self.conn.execute(
+            "SELECT offer_id, row_hash, status, checked_at FROM rows"
+            " WHERE sheet_id = ? AND sheet_name = ? AND row_index = ?",
+            (s_offer.sheet_id, s_offer.sheet_name, s_offer.index),
+        ).fetchone()
+        if state is None or state[3] is None:
+            return False
+
+        offer_id, state_row_hash, status, checked_at = state
+        return (
+            offer_id == s_offer.Offer_ID
+            and status == target_status
+            and state_row_hash == row_hash(s_offer)
+            and time.time() - checked_at < self.revalidate_interval
+        )
+
+    def record(self, s_offer: SOffer, status: str) -> None:
+        if not s_offer.Offer_ID:
+            return
+
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO rows (sheet_id, sheet_name, row_index, offer_id,"
+                " row_hash, status, checked_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (sheet_id, sheet_name, row_index) DO UPDATE SET"
+                " offer_id = excluded.offer_id, row_hash = excluded.row_hash,"
+                " status = excluded.status, checked_at = excluded.checked_at,"
+                " last_error = NULL, updated_at = excluded.updated_at",
+                (
+                    s_offer.sheet_id,
+                    s_offer.sheet_name,
+                    s_offer.index,
+                    s_offer.Offer_ID,
+                    row_hash(s_offer),
+                    status,
+                    now,
+                    now,
+                ),
+            )
+            self.conn.execute(
+                "INSERT INTO offers (offer_id, status, seen_at, updated_at)"
+                " VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (offer_id) DO UPDATE SET status = excluded.status,"
+                " seen_at = excluded.seen_at, updated_at = excluded.updated_at",
+                (s_offer.Offer_ID, status, now, now),
+            )
+
+    def record_error(
+        self,
+        sheet_id: str,
+        sheet_name: str,
+        index: int,
+        error: str,
+    ) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO rows (sheet_id, sheet_name, row_index, last_error,"
+                " error_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (sheet_id, sheet_name, row_index) DO UPDATE SET"
+                " last_error = excluded.last_error, error_at = excluded.error_at,"
+                " updated_at = excluded.updated_at",
+                (sheet_id, sheet_name, index, error, now, now),
+            )
+
+    def record_offers(self, seller_offers: list[SellerOffer]) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO offers (offer_id, status, available_qty, unit_price,"
+                " seen_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (offer_id) DO UPDATE SET status = excluded.status,"
+                " available_qty = excluded.available_qty,"
+                " unit_price = excluded.unit_price, seen_at = excluded.seen_at,"
+                " updated_at = excluded.updated_at",
+                [
+                    (
+                        seller_offer.offer_id,
+                        seller_offer.status,
+                        seller_offer.available_qty,
+                        seller_offer.unit_price,
+                        now,
+                        now,
+                    )
+                    for seller_offer in seller_offers
+                ],
+            )
+
+    def is_payload_unchanged(self, s_offer: SOffer) -> bool:
+        state = self.conn.execute(
+            "SELECT payload_hash, synced_at FROM offers WHERE offer_id = ?",
+            (s_offer.Offer_ID or "",),
+        ).fetchone()
+        if state is None or state[1] is None:
+            return False
+
+        state_payload_hash, synced_at = state
+        return (
+            state_payload_hash == payload_hash(s_offer)
+            and time.time() - synced_at < self.revalidate_interval
+        )
+
+    def record_payload(self, s_offer: SOffer) -> None:
+        if not s_offer.Offer_ID:
+            return
+
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO offers (offer_id, payload_hash, synced_at, updated_at)"
+                " VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (offer_id) DO UPDATE SET"
+                " payload_hash = excluded.payload_hash,"
+                " synced_at = excluded.synced_at, updated_at = excluded.updated_at",
+                (s_offer.Offer_ID, payload_hash(s_offer), now, now),
+            )
+
+    def journal(self, s_offer: SOffer, kind: str) -> None:
+        """Journal a G2G mutation, call it before the row is queued for writing."""
+        if not s_offer.Offer_ID:
+            raise ValueError(f"Row {s_offer.index}: no Offer_ID to journal {kind}")
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO journal (sheet_id, sheet_name, row_index, offer_id,"
+                " kind, payload_hash, cells_json, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    s_offer.sheet_id,
+                    s_offer.sheet_name,
+                    s_offer.index,
+                    s_offer.Offer_ID,
+                    kind,
+                    payload_hash(s_offer),
+                    json.dumps(
+                        [
+                            [row, col, value]
+                            for (row, col), value in s_offer.to_cells(
+                                only_dirty=True
+                            ).items()
+                        ],
+                        default=str,
+                    ),
+                    time.time(),
+                ),
+            )
+
+    def journaled_offer_id(
+        self,
+        s_offer: SOffer,
+        kind: str,
+        since: float | None = None,
+    ) -> str | None:
+        """Offer already made for this row and payload but not yet on the sheet.
+
+        With `since`, entries journaled after that time count too, even when
+        they are on the sheet already: a row snapshot taken before then does
+        not show their Offer_ID.
+        """
+        pending = "applied_at IS NULL"
+        params: tuple[Any, ...] = ()
+        if since is not None:
+            pending = "(applied_at IS NULL OR created_at >= ?)"
+            params = (since,)
+        entry = self.conn.execute(
+            f"SELECT offer_id FROM journal WHERE {pending}"
+            " AND sheet_id = ? AND sheet_name = ? AND row_index = ?"
+            " AND kind = ? AND payload_hash = ? ORDER BY id DESC LIMIT 1",
+            (
+                *params,
+                s_offer.sheet_id,
+                s_offer.sheet_name,
+                s_offer.index,
+                kind,
+                payload_hash(s_offer),
+            ),
+        ).fetchone()
+        return entry[0] if entry is not None else None
+
+    def pending_journal(self) -> list[JournalEntry]:
+        return [
+            JournalEntry(
+                id=id,
+                sheet_id=sheet_id,
+                sheet_name=sheet_name,
+                row_index=row_index,
+                offer_id=offer_id,
+                kind=kind,
+                cells={(row, col): value for row, col, value in json.loads(cells)},
+            )
+            for id, sheet_id, sheet_name, row_index, offer_id, kind, cells in (
+                self.conn.execute(
+                    "SELECT id, sheet_id, sheet_name, row_index, offer_id, kind,"
+                    " cells_json FROM journal WHERE applied_at IS NULL ORDER BY id"
+                )
+            )
+        ]
+
+    def last_journal_id(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM journal").fetchone()[
+            0
+        ]
+
+    def mark_journal_applied(self, up_to_id: int) -> None:
+        """Mark entries up to `up_to_id` as written to the sheet."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE journal SET applied_at = ? WHERE applied_at IS NULL AND id <= ?",
+                (time.time(), up_to_id),
+            )
+
+
+state_store = lazy(
+    lambda: StateStore(
+        file_path=ROOT_PATH.joinpath(config.STATE_DB_FILE),
+        revalidate_interval=config.ROW_STATE_REVALIDATE_INTERVAL,
+    )
+)
@@ -0,0 +1,144 @@
+from datetime import datetime
+from typing import Callable
+
+from .brw.token import TokenManager
+from .config import config
+from .g2g.crwl_api import async_crwl_g2g_api_client
+from .g2g.enums import OfferStatus
+from .lazy import lazy
+from .logger import logger
+from .sheet.buffer import sheet_write_buffer
+from .sheet.models import SOffer
+from .state import state_store
+from .update_messages import (
+    delisted_offer_message,
+    failed_message,
+    last_update_message,
+    listed_offer_message,
+)
+
+STATUS_MESSAGES: dict[OfferStatus, Callable[[datetime], str]] = {
+    OfferStatus.LIVE: listed_offer_message,
+    OfferStatus.DELISTED: delisted_offer_message,
+}
+
+
+class StatusBatcher:
+    """Collect offer status changes of a round and send them in bulk.
+
+    Offers are grouped by target status and sent in chunks of `chunk_size`
+    through the seller bulk_update endpoint. The result of each offer is then
+    written back to the Note and Timeline of its rows.
+    """
+
+    def __init__(self, chunk_size: int) -> None:
+        self.chunk_size = chunk_size
+        # offer_id -> its rows, each with the status the row asks for
+        self.pending: dict[str, list[tuple[SOffer, OfferStatus]]] = {}
+
+    def add(self, s_offer: SOffer, status: OfferStatus) -> None:
+        if not s_offer.Offer_ID:
+            raise ValueError(f"Row {s_offer.index}: no Offer_ID to set {status.value}")
+
+        rows = [
+            (row, row_status)
+            for row, row_status in self.pending.get(s_offer.Offer_ID, [])
+            if row.index != s_offer.index
+        ]
+        self.pending[s_offer.Offer_ID] = rows + [(s_offer, status)]
+
+    async def resolve_failed_chunk(
+        self,
+        offer_ids: list[str],
+        status: OfferStatus,
+        token: str,
+    ) -> dict[str, str | None]:
+        results: dict[str, str | None] = {}
+        for offer_id in offer_ids:
+            try:
+                g2g_offer = (
+                    await async_crwl_g2g_api_client.get_offer_status(
+                        offer_id, token=token
+                    )
+                ).payload
+                results[offer_id] = (
+                    None
+                    if g2g_offer.status == status.value
+                    else f"Offer status is {g2g_offer.status}, expected {status.value}"
+                )
+            except Exception as e:
+                results[offer_id] = str(e)
+        return results
+
+    async def flush(self, token_manager: TokenManager) -> dict[int, str]:
+        """Send the pending status changes, return the failed rows' errors."""
+        if len(self.pending) == 0:
+            return {}
+
+        # Without a token nothing is sent, the rows stay for the next flush
+        token = await token_manager.get_token()
+        user_id = (await token_manager.get_payload()).sub
+        pending, self.pending = self.pending, {}
+
+        # The last row of an offer decides its target status
+        targets = {offer_id: rows[-1][1] for offer_id, rows in pending.items()}
+        groups: dict[OfferStatus, list[str]] = {}
+        for offer_id, status in targets.items():
+            groups.setdefault(status, []).append(offer_id)
+
+        # offer_id -> None on success or the failure reason
+        results: dict[str, str | None] = {}
+        for status, offer_ids in groups.items():
+            for i in range(0, len(offer_ids), self.chunk_size):
+                chunk = offer_ids[i : i + self.chunk_size]
+                logger.info(f"Bulk update {len(chunk)} offers to {status.value}")
+                try:
+                    res = await async_crwl_g2g_api_client.bulk_update(
+                        offer_ids=chunk,
+                        status=status.value,
+                        token=token,
+                        user_id=user_id,
+                    )
+                except Exception as e:
+                    results.update({offer_id: str(e) for offer_id in chunk})
+                    continue
+
+                if res is not None and res.payload.fail == 0:
+                    results.update({offer_id: None for offer_id in chunk})
+                else:
+                    results.update(
+                        await self.resolve_failed_chunk(chunk, status, token)
+                    )
+
+        failed_rows: dict[int, str] = {}
+        for offer_id, rows in pending.items():
+            now = datetime.now()
+            status = targets[offer_id]
+            for s_offer, row_status in rows:
+                error = results[offer_id]
+                if error is None and row_status != status:
+                    error = (
+                        f"Offer set to {status.value} by row {rows[-1][0].index}, "
+                        f"not {row_status.value}"
+                    )
+
+                if error is None:
+                    s_offer.Timeline = last_update_message(now)
+                    s_offer.Note = STATUS_MESSAGES[row_status](now)
+                    state_store.record(s_offer, status.value)
+                    state_store.journal(s_offer, "status")
+                else:
+                    logger.error(f"FAILED AT ROW: {s_offer.index}: {error}")
+                    s_offer.Note = failed_message(now, error)
+                    state_store.record_error(
+                        s_offer.sheet_id, s_offer.sheet_name, s_offer.index, error
+                    )
+                    failed_rows[s_offer.index] = error
+                await sheet_write_buffer.add(s_offer)
+
+        return failed_rows
+
+
+status_batcher = lazy(
+    lambda: StatusBatcher(chunk_size=config.G2G_BULK_UPDATE_CHUNK_SIZE)
+)
@@ -24,9 +24,17 @@ def edited_offer_message(now: datetime) -> str:
     return f"{last_update_message(now)}: Offer đã được cập nhật"
 
 
+def edited_offer_no_change_message(now: datetime) -> str:
+    return f"{last_update_message(now)}: Offer không thay đổi, Không cần cập nhật"
+
+
 def delisted_offer_message(now: datetime) -> str:
     return f"{last_update_message(now)}: Offer đã được delist"
 
 
 def delisted_offer_no_change_message(now: datetime) -> str:
     return f"{last_update_message(now)}: Offer đã được delist, Không cần cập nhật"
+
+
+def failed_message(now: datetime, reason: str | Exception) -> str:
+    return f"{last_update_message(now)}: FAILED: {reason}"
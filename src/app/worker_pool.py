@@ -0,0 +1,75 @@
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncGenerator, Awaitable, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class WorkerPool(Generic[T]):
+    """Run chains of jobs concurrently with a global and a per-key limit.
+
+    Jobs inside one chain run one after another in order, chains run in
+    parallel. `max_concurrency_per_key` of 0 means no per-key limit.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_concurrency_per_key: int = 0,
+    ) -> None:
+        self.semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self.max_concurrency_per_key = max_concurrency_per_key
+        self.key_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    @asynccontextmanager
+    async def slot(self, key: str | None = None) -> AsyncGenerator[None, None]:
+        async with AsyncExitStack() as stack:
+            if key is not None and self.max_concurrency_per_key > 0:
+                if key not in self.key_semaphores:
+                    self.key_semaphores[key] = asyncio.Semaphore(
+                        self.max_concurrency_per_key
+                    )
+                await stack.enter_async_context(self.key_semaphores[key])
+            await stack.enter_async_context(self.semaphore)
+            yield
+
+    async def run_chain(
+        self,
+        chain: list[T],
+        handler: Callable[[T], Awaitable[None]],
+        key_func: Callable[[T], str | None],
+        wait_func: Callable[[str | None], Awaitable[object]] | None = None,
+        due_func: Callable[[str | None], bool] | None = None,
+    ) -> None:
+        """Run a chain of jobs in order.
+
+        `wait_func` sleeps until a key may start again, without holding a
+        slot. `due_func` checks that again once the slot is taken: a row on
+        the same key may have finished and spaced the key meanwhile, then the
+        slot goes to other keys while this job waits again.
+        """
+        for job in chain:
+            key = key_func(job)
+            while True:
+                if wait_func is not None:
+                    await wait_func(key)
+                async with self.slot(key):
+                    if due_func is not None and not due_func(key):
+                        continue
+                    await handler(job)
+                    break
+
+    async def run(
+        self,
+        chains: list[list[T]],
+        handler: Callable[[T], Awaitable[None]],
+        key_func: Callable[[T], str | None] = lambda _: None,
+        wait_func: Callable[[str | None], Awaitable[object]] | None = None,
+        due_func: Callable[[str | None], bool] | None = None,
+    ) -> None:
+        await asyncio.gather(
+            *[
+                self.run_chain(chain, handler, key_func, wait_func, due_func)
+                for chain in chains
+            ]
+        )
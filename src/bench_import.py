@@ -0,0 +1,65 @@
+"""Import time benchmark
+
+Runs `python -X importtime -c "import <module>"` in a clean interpreter a few
+times and prints the best total and the slowest modules, e.g.
+
+    uv run .\\src\\bench_import.py main --top 15 --max-ms 1500
+
+Exits with 1 when the best total is above `--max-ms`, so a startup regression
+shows up in CI.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from app.paths import SRC_PATH
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative import time of each module in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_PATH,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda times: times[args.module])
+    total_ms = best[args.module] / 1000
+
+    print(f"import {args.module}: {total_ms:.1f} ms (best of {args.runs})")
+    for name, cumulative in sorted(best.items(), key=lambda item: -item[1])[
+        1 : args.top + 1
+    ]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"import {args.module} is over the {args.max_ms} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
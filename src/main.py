@@ -1,4 +1,7 @@
 import asyncio
+import json
+import os
+import time
 from datetime import datetime
 
 from pydantic import ValidationError
@@ -6,94 +9,329 @@ from pydoll.browser.options import Options
 
 from app.config import config
 
-from app.paths import USER_DIR_PATH
-from app.brw.brw import G2GBrowser
+from app.paths import ROOT_PATH
+from app.brw.token import TokenManager
+from app.brw.token_provider import (
+    BrowserTokenProvider,
+    FileTokenProvider,
+    StubTokenProvider,
+    TokenProvider,
+)
 from app.logger import logger
-from app.process import main_flow
+from app.process import main_flow, prefetch_offer_attributes
+from app.g2g.crwl_api import async_crwl_g2g_api_client
 from app.sheet.models import SOffer
-from app.update_messages import last_update_message
-from app.utils import sleep_for
+from app.sheet.buffer import sheet_write_buffer
+from app.sheet.probe import sheet_change_probe
+from app.sheet.rate_limit import sheets_rate_limiter
+from app.status_batcher import status_batcher
+from app.offer_index import seller_offer_index
+from app.state import state_store
+from app.sheet.enums import ProcessType
+from app.update_messages import failed_message, last_update_message
+from app.g2g.models import URlQuery
+from app.worker_pool import WorkerPool
+from app.job_queue import Job, job_queue
+from app.pacing import pacing_scheduler
 
 NOTE_COL = "C"
 
 
-async def run_in_loop(brw: G2GBrowser):
+def group_rows_by_offer(
+    run_rows: list[tuple[int, dict]],
+) -> list[list[tuple[int, dict]]]:
+    # Rows sharing an Offer_ID stay in one chain so they run in sheet order
+    chains: list[list[tuple[int, dict]]] = []
+    offer_chains: dict[str, list[tuple[int, dict]]] = {}
+    for index, model_dict in run_rows:
+        offer_id = model_dict.get("Offer_ID")
+        if not offer_id:
+            chains.append([(index, model_dict)])
+            continue
+        if offer_id not in offer_chains:
+            offer_chains[offer_id] = []
+            chains.append(offer_chains[offer_id])
+        offer_chains[offer_id].append((index, model_dict))
+
+    # Chains start in the given (priority) order, rows of one offer keep
+    # sheet order
+    for chain in chains:
+        chain.sort(key=lambda row: row[0])
+    return chains
+
+
+def row_brand_key(row: tuple[int, dict]) -> str | None:
+    _, model_dict = row
+    try:
+        url_query = URlQuery.from_url(model_dict.get("Create_offer_link") or "")
+    except ValidationError:
+        return None
+    return f"{url_query.service_id}/{url_query.brand_id}"
+
+
+async def run_row(
+    token_manager: TokenManager,
+    index: int,
+    model_dict: dict,
+    pacing_key: str | None = None,
+) -> str | None:
+    """Run one row, return the error when it failed and should run again."""
+    logger.info(f"INDEX (ROW): {index}")
+    try:
+        s_offer = SOffer.model_validate(model_dict)
+        if state_store.should_skip(s_offer):
+            logger.info(f"Offer already in {s_offer.Check} state. Skip")
+            return None
+
+        await main_flow(token_manager, s_offer)
+        # Next row on the same brand starts after relax, others are not held
+        pacing_scheduler.space(pacing_key, s_offer.relax)
+    except ValidationError as e:
+        logger.error(f"VALIDATION ERROR AT ROW: {index}")
+        logger.error(e.errors())
+        now = datetime.now()
+        await sheet_write_buffer.add_cell(
+            sheet_id=config.SPREADSHEET_KEY,
+            sheet_name=config.SHEET_NAME,
+            index=index,
+            col=NOTE_COL,
+            value=f"{last_update_message(now)}: VALIDATION ERROR AT ROW: {index}",
+        )
+
+    except Exception as e:
+        logger.error(f"FAILED AT ROW: {index}")
+        now = datetime.now()
+        await sheet_write_buffer.add_cell(
+            sheet_id=config.SPREADSHEET_KEY,
+            sheet_name=config.SHEET_NAME,
+            index=index,
+            col=NOTE_COL,
+            value=failed_message(now, e),
+        )
+        state_store.record_error(
+            config.SPREADSHEET_KEY, config.SHEET_NAME, index, str(e)
+        )
+        logger.exception(e, exc_info=True)
+        return str(e)
+
+    return None
+
+
+def write_status(progress: dict) -> None:
+    """Write this worker's progress for the supervisor."""
+    if not config.STATUS_FILE:
+        return
+
+    status = {
+        **progress,
+        "pid": os.getpid(),
+        "updated_at": time.time(),
+        "pending_jobs": job_queue.pending_count(),
+        "backoff_jobs": job_queue.backoff_jobs(),
+        "pacing": pacing_scheduler.round_stats(),
+        "sheets": sheets_rate_limiter.usage(),
+    }
+    file_path = ROOT_PATH.joinpath(config.STATUS_FILE)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_suffix(f"{file_path.suffix}.tmp")
+    tmp_path.write_text(json.dumps(status, default=str), encoding="utf-8")
+    os.replace(tmp_path, file_path)
+
+
+async def replay_journal() -> None:
+    """Queue sheet writes of G2G mutations that never reached the sheet."""
+    entries = state_store.pending_journal()
+    if len(entries) == 0:
+        return
+
+    logger.info(f"Replay {len(entries)} journaled sheet writes")
+    for entry in entries:
+        await sheet_write_buffer.add_cells(
+            sheet_id=entry.sheet_id,
+            sheet_name=entry.sheet_name,
+            cells=entry.cells,
+        )
+    journal_id = state_store.last_journal_id()
+    await sheet_write_buffer.flush()
+    if sheet_write_buffer.pending_rows() == 0:
+        state_store.mark_journal_applied(journal_id)
+
+
+def restore_created_offers(jobs: list[Job]) -> None:
+    """Give leased rows the offers created for them after their snapshot.
+
+    A run stopped after a create but before its job was acknowledged leaves
+    a snapshot without the Offer_ID, running it again would create the offer
+    a second time.
+    """
+    for job in jobs:
+        if job.model_dict.get("Offer_ID"):
+            continue
+        try:
+            s_offer = SOffer.model_validate(job.model_dict)
+        except ValidationError:
+            continue
+
+        offer_id = state_store.journaled_offer_id(
+            s_offer, "create", since=job.updated_at
+        )
+        if offer_id is not None:
+            logger.info(f"Row {job.row_index}: offer {offer_id} already created")
+            job.model_dict["Offer_ID"] = offer_id
+
+
+async def run_in_loop(token_manager: TokenManager, scan: bool = True) -> int:
+    """Run one round, return the number of failed rows.
+
+    `scan` reads the sheet into the job queue first, without it only the jobs
+    already queued (e.g. left by a previous run) are worked.
+    """
     logger.info("Start running")
 
-    run_indexes = SOffer.get_run_indexes(config.SPREADSHEET_KEY, config.SHEET_NAME, 2)
-    # run_indexes = [5]
-    logger.info(f"Run index: {run_indexes}")
+    if scan:
+        job_queue.enqueue(
+            config.SPREADSHEET_KEY,
+            config.SHEET_NAME,
+            await sheet_change_probe.read_snapshot(
+                config.SPREADSHEET_KEY, config.SHEET_NAME
+            ),
+        )
+    jobs = {
+        job.row_index: job
+        for job in job_queue.lease(config.SPREADSHEET_KEY, config.SHEET_NAME)
+    }
+    restore_created_offers(list(jobs.values()))
+    run_rows = [(job.row_index, job.model_dict) for job in jobs.values()]
+    logger.info(f"Run index: {[index for index, _ in run_rows]}")
 
-    for index in run_indexes:
-        logger.info(f"INDEX (ROW): {index}")
+    s_offers: list[SOffer] = []
+    for _, model_dict in run_rows:
         try:
-            s_offer = SOffer.get(
-                sheet_id=config.SPREADSHEET_KEY,
-                sheet_name=config.SHEET_NAME,
-                index=index,
-            )
-
-            await main_flow(brw, s_offer)
-            await sleep_for(s_offer.relax)
-        except ValidationError as e:
-            logger.error(f"VALIDATION ERROR AT ROW: {index}")
-            logger.error(e.errors())
-            try:
-                now = datetime.now()
-                worksheet = SOffer.get_worksheet(
-                    sheet_id=config.SPREADSHEET_KEY, sheet_name=config.SHEET_NAME
-                )
-                worksheet.batch_update(
-                    [
-                        {
-                            "range": f"{NOTE_COL}{index}",
-                            "values": [
-                                [
-                                    f"{last_update_message(now)}: VALIDATION ERROR AT ROW: {index}"
-                                ]
-                            ],
-                        }
-                    ]
-                )
-            except Exception as e:
-                logger.error(e)
-                await sleep_for(10)
+            s_offers.append(SOffer.model_validate(model_dict))
+        except ValidationError:
+            # Reported on the row when it runs
+            pass
+    await prefetch_offer_attributes(s_offers)
+    if any(
+        s_offer.Offer_ID
+        and s_offer.Check in (ProcessType.LIST.value, ProcessType.DELIST.value)
+        and not state_store.should_skip(s_offer)
+        for s_offer in s_offers
+    ):
+        await seller_offer_index.load(token_manager)
 
-        except Exception as e:
-            logger.error(f"FAILED AT ROW: {index}")
-            try:
-                now = datetime.now()
-                worksheet = SOffer.get_worksheet(
-                    sheet_id=config.SPREADSHEET_KEY, sheet_name=config.SHEET_NAME
-                )
-                worksheet.batch_update(
-                    [
-                        {
-                            "range": f"{NOTE_COL}{index}",
-                            "values": [[f"{last_update_message(now)}: FAILED: {e}"]],
-                        }
-                    ]
-                )
-            except Exception as e1:
-                logger.error(e1)
-                await sleep_for(10)
-            logger.exception(e, exc_info=True)
+    worker_pool: WorkerPool[tuple[int, dict]] = WorkerPool(
+        max_concurrency=config.MAX_CONCURRENT_ROWS,
+        max_concurrency_per_key=config.MAX_CONCURRENT_ROWS_PER_BRAND,
+    )
 
+    errors: dict[int, str] = {}
 
-async def main():
+    async def handler(row: tuple[int, dict]):
+        error = await run_row(token_manager, *row, pacing_key=row_brand_key(row))
+        if error is not None:
+            errors[row[0]] = error
+
+    await worker_pool.run(
+        group_rows_by_offer(run_rows),
+        handler=handler,
+        key_func=row_brand_key,
+        wait_func=pacing_scheduler.wait,
+        due_func=pacing_scheduler.is_due,
+    )
+
+    # Rows whose bulk status update failed run again like any failed row
+    errors.update(await status_batcher.flush(token_manager))
+    await async_crwl_g2g_api_client.save_caches()
+    journal_id = state_store.last_journal_id()
+    await sheet_write_buffer.flush()
+    if sheet_write_buffer.pending_rows() == 0:
+        state_store.mark_journal_applied(journal_id)
+    # Only now are the rows' results on the sheet
+    job_queue.ack([job for index, job in jobs.items() if index not in errors])
+    for index, error in errors.items():
+        # Status rows kept from an earlier flush may belong to no job of this round
+        if index in jobs:
+            job_queue.fail(jobs[index], error)
+
+    logger.info(f"Sheets budget usage: {sheets_rate_limiter.usage()}")
+    logger.info(f"G2G limiter stats: {async_crwl_g2g_api_client.limiter_stats()}")
+    logger.info(
+        f"G2G connection pool stats: {async_crwl_g2g_api_client.connection_pool_stats()}"
+    )
+    logger.info(f"Pacing stats: {pacing_scheduler.round_stats()}")
+
+    return len(errors)
+
+
+def build_token_manager() -> TokenManager:
+    token_store = FileTokenProvider(
+        file_path=ROOT_PATH.joinpath(config.TOKEN_FILE) if config.TOKEN_FILE else None,
+        env_token=config.G2G_ACCESS_TOKEN,
+    )
     options = Options()
     options.add_argument("--start-maximized")
-    options.add_argument(f"--user-data-dir={str(USER_DIR_PATH)}")
-    async with G2GBrowser.init(options) as brw:
-        await brw.get_access_token_in_safe()
-        logger.info("Login success")
+    options.add_argument(f"--user-data-dir={str(ROOT_PATH.joinpath(config.USER_DIR))}")
+
+    providers: list[TokenProvider] = {
+        "auto": [token_store, BrowserTokenProvider(options)],
+        "file": [token_store],
+        "browser": [BrowserTokenProvider(options)],
+        "stub": [StubTokenProvider(sub=config.G2G_ACCOUNT_ID)],
+    }[config.TOKEN_PROVIDER]
+    return TokenManager(
+        providers,
+        refresh_margin=config.TOKEN_REFRESH_MARGIN,
+        # Stub tokens must not end up where real runs look for one
+        token_store=token_store if config.TOKEN_PROVIDER != "stub" else None,
+    )
+
+
+async def main():
+    token_manager = build_token_manager()
+    await token_manager.start()
+    logger.info("Login success")
+    try:
+        await replay_journal()
+        # Jobs left by a stopped run go first, without a new scan
+        resume = job_queue.recover() > 0
+        progress = {"rounds": 0, "skipped_rounds": 0, "errors": 0, "failed_rows": 0}
         while True:
             try:
+                if resume:
+                    logger.info("Resume queued jobs")
+                    resume = False
+                    progress["failed_rows"] = await run_in_loop(
+                        token_manager, scan=False
+                    )
+                    progress["rounds"] += 1
+                    continue
+
+                # Rounds start the probe interval apart, not after it
+                await pacing_scheduler.start_round(sheet_change_probe.interval)
+                if not await sheet_change_probe.has_changed(
+                    config.SPREADSHEET_KEY, config.SHEET_NAME
+                ):
+                    progress["skipped_rounds"] += 1
+                    continue
+
                 logger.info("Run in loop")
-                await run_in_loop(brw)
-                await sleep_for(config.RELAX_TIME_EACH_ROUND)
+                progress["failed_rows"] = await run_in_loop(token_manager)
+                progress["rounds"] += 1
+                sheet_change_probe.commit(
+                    config.SPREADSHEET_KEY, rerun=progress["failed_rows"] > 0
+                )
             except Exception as e:
+                # The round did not finish, run a full one next time
+                sheet_change_probe.invalidate(config.SPREADSHEET_KEY)
+                job_queue.recover()
+                progress["errors"] += 1
                 logger.exception(e)
+            finally:
+                write_status(progress)
+    finally:
+        await async_crwl_g2g_api_client.save_caches()
+        await token_manager.stop()
 
 
 if __name__ == "__main__":
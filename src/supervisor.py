@@ -0,0 +1,166 @@
+"""Run one main.py worker per account/sheet shard.
+
+The shards file (SHARDS_FILE, or the first argument) is a JSON list:
+
+    [
+        {"name": "acc1", "SPREADSHEET_KEY": "...", "SHEET_NAME": "Sheet1"},
+        {"name": "acc2", "SPREADSHEET_KEY": "...", "SHEET_NAME": "Sheet1",
+         "env": {"MAX_CONCURRENT_ROWS": "2"}}
+    ]
+
+Each worker gets its own Chrome profile, state database, caches, log and
+status file under the shard name, and an equal share of the Sheets budgets.
+`env` overrides any of them.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+from pydantic import BaseModel
+
+from app.config import config
+from app.logger import logger
+from app.paths import ROOT_PATH, SRC_PATH
+
+
+class Shard(BaseModel):
+    name: str
+    SPREADSHEET_KEY: str
+    SHEET_NAME: str
+    env: dict[str, str] = {}
+
+
+class ShardWorker:
+    """Keep one worker process of a shard running, restart it with backoff."""
+
+    def __init__(self, shard: Shard, shard_count: int) -> None:
+        self.shard = shard
+        self.shard_count = shard_count
+        self.process: asyncio.subprocess.Process | None = None
+        self.restarts = 0
+        self.last_exit_code: int | None = None
+
+    @property
+    def status_file(self) -> str:
+        return self.env()["STATUS_FILE"]
+
+    def env(self) -> dict[str, str]:
+        name = self.shard.name
+        return {
+            **os.environ,
+            # Shards are separate accounts, a shared token does not fit them.
+            # Empty, not unset, so setting.env cannot fill it in again.
+            "G2G_ACCESS_TOKEN": "",
+            "SPREADSHEET_KEY": self.shard.SPREADSHEET_KEY,
+            "SHEET_NAME": self.shard.SHEET_NAME,
+            "USER_DIR": f"user_dir/{name}",
+            "STATE_DB_FILE": f"cache/{name}/state.sqlite3",
+            "G2G_COLLECTIONS_CACHE_FILE": f"cache/{name}/collections.json",
+            "STATUS_FILE": f"cache/{name}/status.json",
+            "TOKEN_FILE": f"cache/{name}/token.jwt",
+            "LOG_FILE_NAME": f"{name}.log",
+            # One Sheets quota for every shard
+            "SHEETS_READ_PER_MINUTE": str(
+                config.SHEETS_READ_PER_MINUTE / self.shard_count
+            ),
+            "SHEETS_WRITE_PER_MINUTE": str(
+                config.SHEETS_WRITE_PER_MINUTE / self.shard_count
+            ),
+            **self.shard.env,
+        }
+
+    async def run(self) -> None:
+        failures = 0
+        while True:
+            started_at = time.monotonic()
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                str(SRC_PATH.joinpath("main.py")),
+                cwd=ROOT_PATH,
+                env=self.env(),
+            )
+            logger.info(f"Shard {self.shard.name}: started pid {self.process.pid}")
+            self.last_exit_code = await self.process.wait()
+
+            # A worker that ran for a while crashed fresh, not in a loop
+            if time.monotonic() - started_at > config.SHARD_RESTART_MAX_BACKOFF:
+                failures = 0
+            failures += 1
+            self.restarts += 1
+            delay = min(2**failures, config.SHARD_RESTART_MAX_BACKOFF)
+            logger.error(
+                f"Shard {self.shard.name}: exited with {self.last_exit_code}, "
+                f"restart in {delay} seconds"
+            )
+            await asyncio.sleep(delay)
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+
+    def status(self) -> dict:
+        status: dict = {}
+        try:
+            status = json.loads(
+                ROOT_PATH.joinpath(self.status_file).read_text(encoding="utf-8")
+            )
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Shard {self.shard.name}: read status failed: {e}")
+
+        return {
+            **status,
+            "running": self.process is not None and self.process.returncode is None,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+        }
+
+
+async def report(workers: list[ShardWorker]) -> None:
+    file_path = ROOT_PATH.joinpath("cache", "supervisor_status.json")
+    while True:
+        await asyncio.sleep(config.SHARD_STATUS_INTERVAL)
+        statuses = {worker.shard.name: worker.status() for worker in workers}
+        for name, status in statuses.items():
+            logger.info(
+                f"Shard {name}: running={status['running']} "
+                f"rounds={status.get('rounds')} "
+                f"skipped={status.get('skipped_rounds')} "
+                f"failed_rows={status.get('failed_rows')} "
+                f"pending_jobs={status.get('pending_jobs')} "
+                f"backoff_jobs={len(status.get('backoff_jobs') or [])} "
+                f"restarts={status['restarts']}"
+            )
+
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = file_path.with_suffix(f"{file_path.suffix}.tmp")
+        tmp_path.write_text(json.dumps(statuses, default=str), encoding="utf-8")
+        os.replace(tmp_path, file_path)
+
+
+async def main():
+    shards_file = ROOT_PATH.joinpath(
+        sys.argv[1] if len(sys.argv) > 1 else config.SHARDS_FILE
+    )
+    shards = [
+        Shard.model_validate(shard)
+        for shard in json.loads(shards_file.read_text(encoding="utf-8"))
+    ]
+    if len({shard.name for shard in shards}) != len(shards):
+        raise ValueError(f"Shard names in {shards_file} must be unique")
+
+    workers = [ShardWorker(shard, shard_count=len(shards)) for shard in shards]
+    logger.info(f"Start {len(workers)} shards: {[shard.name for shard in shards]}")
+    try:
+        await asyncio.gather(report(workers), *[worker.run() for worker in workers])
+    finally:
+        for worker in workers:
+            worker.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
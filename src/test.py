@@ -5,7 +5,7 @@ from pydoll.browser.options import Options
 
 from app.brw.brw import G2GBrowser
 from app.paths import USER_DIR_PATH
-from app.g2g.crwl_api import crwl_g2g_api_client
+from app.g2g.crwl_api import async_crwl_g2g_api_client
 from app.brw.utils import decode_jwt
 
 
@@ -21,7 +21,7 @@ async def test():
         print(token)
 
     # dpd_collection_ids = ["a837ebae", "9c3e3e10", "e2fdcf93", "0c832872"]
-    # print(crwl_g2g_api_client.attributes_search(dpd_collection_ids))
+    # print(await async_crwl_g2g_api_client.attributes_search(dpd_collection_ids))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+import os
+from typing import Any, Callable
+
+import pytest
+
+# Settings the app requires, so tests never need setting.env or keys.json.
+# Code under test only builds the clients it touches.
+for key, value in {
+    "LOG_NAME": "test",
+    "LOG_LEVEL": "WARNING",
+    "IS_LOG_FILE": "false",
+    "LOG_FILE_NAME": "test.log",
+    "KEYS_PATH": "keys.json",
+    "SPREADSHEET_KEY": "test-sheet",
+    "SHEET_NAME": "Sheet1",
+    "G2G_ACCOUNT_ID": "test-account",
+    "G2G_API_KEY": "test",
+    "G2G_SECRET_KEY": "test",
+    "RELAX_TIME_EACH_ROUND": "0",
+}.items():
+    os.environ.setdefault(key, value)
+
+from app.sheet.enums import ProcessType  # noqa: E402
+
+
+@pytest.fixture
+def offer_row() -> Callable[..., dict]:
+    """Raw model dict of a valid SOffer row, `fields` override its columns."""
+
+    def make(index: int = 2, **fields: Any) -> dict:
+        return {
+            "sheet_id": "sheet",
+            "sheet_name": "Sheet1",
+            "index": index,
+            "Check": ProcessType.LIST.value,
+            "Create_offer_link": "https://www.g2g.com/offers/create?service_id=s&brand_id=b",
+            "title": "Offer",
+            "description": "Offer",
+            "currency": "USD",
+            "unit_price": 1.5,
+            "delivery_method": "manual",
+            "stock": 10,
+            "minimum_purchase_quantity": 1,
+            "delivery_speed_min": 1,
+            "delivery_speed_max": 2,
+            "delivery_time": 1,
+            "region": "Global",
+            **fields,
+        }
+
+    return make
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import time
+
+from app.cache import TTLCache
+
+
+def test_entries_expire_after_ttl():
+    cache: TTLCache[str] = TTLCache(ttl=0.05, max_size=10)
+    cache.set(("a",), "value")
+    assert cache.get(("a",)) == "value"
+    time.sleep(0.06)
+    assert cache.get(("a",)) is None
+    assert len(cache.entries) == 0
+
+
+def test_evicts_least_recently_used():
+    cache: TTLCache[int] = TTLCache(ttl=60, max_size=2)
+    cache.set(("a",), 1)
+    cache.set(("b",), 2)
+    assert cache.get(("a",)) == 1
+    cache.set(("c",), 3)
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1
+    assert cache.get(("c",)) == 3
+
+
+def test_writes_the_file_on_flush_only(tmp_path):
+    file_path = tmp_path / "cache.json"
+    cache: TTLCache[int] = TTLCache(ttl=60, max_size=10, file_path=file_path)
+    for i in range(5):
+        cache.set(("key", i), i)
+    assert not file_path.exists()
+
+    asyncio.run(cache.flush())
+    assert len(json.loads(file_path.read_text(encoding="utf-8"))) == 5
+
+    # Nothing changed, nothing written
+    file_path.unlink()
+    asyncio.run(cache.flush())
+    assert not file_path.exists()
+
+
+def test_restart_loads_unexpired_entries(tmp_path):
+    file_path = tmp_path / "cache.json"
+    cache: TTLCache[dict] = TTLCache(
+        ttl=60,
+        max_size=10,
+        file_path=file_path,
+        dump=lambda value: {"v": value},
+        load=lambda data: data["v"],
+    )
+    cache.set(("a", 1), {"x": 1})
+    cache.set(("b", 2), {"x": 2})
+    cache.invalidate(("b", 2))
+    asyncio.run(cache.flush())
+
+    restarted: TTLCache[dict] = TTLCache(
+        ttl=60,
+        max_size=10,
+        file_path=file_path,
+        dump=lambda value: {"v": value},
+        load=lambda data: data["v"],
+    )
+    assert restarted.get(("a", 1)) == {"x": 1}
+    assert restarted.get(("b", 2)) is None
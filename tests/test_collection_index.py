@@ -0,0 +1,46 @@
+from app.g2g.models import CompactCollection
+
+
+def leaf(value: str, dpd_ids: tuple[str, ...] = ()) -> dict:
+    return {
+        "collection_id": f"c-{value}",
+        "dataset_id": f"d-{value}",
+        "value": value,
+        "children": [],
+        "dpd_collections": [
+            {"collection_id": id, "sort_order": i, "is_primary_img": False}
+            for i, id in enumerate(dpd_ids)
+        ],
+    }
+
+
+def collection(children: list[dict]) -> CompactCollection:
+    return CompactCollection.model_validate(
+        {
+            "collection_id": "root",
+            "value": "Server",
+            "sort_order": 1,
+            "input_field": "dropdown",
+            "is_required": True,
+            "children": children,
+        }
+    )
+
+
+def test_looks_up_leaves_by_normalized_value():
+    index = collection([leaf("EU West"), leaf("US East")]).index()
+    assert index.lookup("eu west") is not None
+    assert index.lookup("eu west").collection_id == "c-EU West"
+    assert index.lookup("Asia") is None
+    assert index.accepted_values == ["EU West", "US East"]
+
+
+def test_merges_dpd_collections_of_children_sharing_a_value():
+    index = collection(
+        [leaf("EU", ("dpd-1",)), leaf("EU", ("dpd-1", "dpd-2")), leaf("US")]
+    ).index()
+    assert [dpd.collection_id for dpd in index.dpd_collections["EU"]] == [
+        "dpd-1",
+        "dpd-2",
+    ]
+    assert "US" not in index.dpd_collections
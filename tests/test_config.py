@@ -0,0 +1,8 @@
+import os
+
+from app.config import Config
+
+
+def test_empty_access_token_is_none():
+    config = Config.model_validate({**os.environ, "G2G_ACCESS_TOKEN": ""})
+    assert config.G2G_ACCESS_TOKEN is None
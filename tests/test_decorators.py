@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import decorators
+from pydantic import BaseModel, ValidationError
+
+from app.decorators import is_unsent, parse_retry_after, retry_on_fail
+
+
+def status_error(
+    status_code: int, headers: dict | None = None
+) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://g2g.test")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> list[float]:
+    sleeps: list[float] = []
+
+    async def sleep(delay: float) -> None:
+        sleeps.append(delay)
+
+    monkeypatch.setattr(decorators.asyncio, "sleep", sleep)
+    return sleeps
+
+
+def failing(errors: list[Exception], max_sleep_interval: float = 60, **kwargs):
+    calls = 0
+
+    @retry_on_fail(
+        max_retries=len(errors), max_sleep_interval=max_sleep_interval, **kwargs
+    )
+    async def call() -> int:
+        nonlocal calls
+        calls += 1
+        if errors:
+            raise errors.pop(0)
+        return calls
+
+    return call
+
+
+def test_parses_seconds_and_dates():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-1") == 0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+
+
+def test_waits_for_retry_after(sleeps):
+    call = failing([status_error(429, {"Retry-After": "7"})])
+    assert asyncio.run(call()) == 2
+    assert sleeps == [7]
+
+
+def test_retry_after_is_capped(sleeps):
+    call = failing([status_error(503, {"Retry-After": "3600"})], max_sleep_interval=30)
+    assert asyncio.run(call()) == 2
+    assert sleeps == [30]
+
+
+def test_client_errors_are_not_retried(sleeps):
+    call = failing([status_error(404)])
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(call())
+    assert sleeps == []
+
+
+def validation_error() -> ValidationError:
+    class Created(BaseModel):
+        offer_id: str
+
+    try:
+        Created.model_validate({})
+    except ValidationError as e:
+        return e
+    raise AssertionError
+
+
+def test_bad_responses_are_not_retried(sleeps):
+    call = failing([validation_error()])
+    with pytest.raises(ValidationError):
+        asyncio.run(call())
+    assert sleeps == []
+
+
+def test_creates_retry_only_unsent_requests(sleeps):
+    request = httpx.Request("POST", "https://g2g.test/offer")
+    call = failing(
+        [httpx.ConnectError("refused", request=request), status_error(429)],
+        retry_on=is_unsent,
+    )
+    assert asyncio.run(call()) == 3
+
+    for error in (httpx.ReadTimeout("timeout", request=request), status_error(502)):
+        call = failing([error], retry_on=is_unsent)
+        with pytest.raises(type(error)):
+            asyncio.run(call())
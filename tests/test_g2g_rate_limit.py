@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from app.g2g.rate_limit import AdaptiveLimiter
+
+
+def make_limiter(**kwargs) -> AdaptiveLimiter:
+    return AdaptiveLimiter(
+        **{
+            "name": "test",
+            "initial_limit": 4,
+            "max_limit": 8,
+            "latency_threshold": 1,
+            **kwargs,
+        }
+    )
+
+
+def test_grows_additively_on_fast_successes():
+    limiter = make_limiter()
+    limiter.on_response(200, latency=0.1)
+    assert limiter.limit == 4.25
+    for _ in range(100):
+        limiter.on_response(200, latency=0.1)
+    assert limiter.limit == 8
+
+
+def test_halves_once_per_burst_of_errors():
+    limiter = make_limiter()
+    limiter.on_response(500, latency=0.1)
+    limiter.on_response(None, latency=0.1)
+    assert limiter.limit == 2
+    assert limiter.stats()["requests"] == 2
+
+
+def test_slow_responses_decrease_and_client_errors_keep_the_limit():
+    limiter = make_limiter()
+    limiter.on_response(404, latency=0.1)
+    assert limiter.limit == 4
+    limiter.on_response(200, latency=2)
+    assert limiter.limit == 2
+
+
+def test_never_drops_below_min_limit():
+    limiter = make_limiter(initial_limit=1)
+    limiter.on_response(429, latency=0.1)
+    assert limiter.limit == 1
+
+
+def test_429_pauses_new_requests_for_retry_after():
+    limiter = make_limiter()
+    limiter.on_response(429, latency=0.1, retry_after=0.1)
+    assert limiter.stats()["throttled"] == 1
+
+    async def request() -> float:
+        started_at = time.monotonic()
+        async with limiter.slot():
+            return time.monotonic() - started_at
+
+    assert asyncio.run(request()) >= 0.09
+
+
+def test_in_flight_is_bounded_by_the_limit():
+    limiter = make_limiter(initial_limit=2)
+    peak = 0
+
+    async def request() -> None:
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def burst() -> None:
+        await asyncio.gather(*[request() for _ in range(6)])
+
+    asyncio.run(burst())
+    assert peak == 2
+    assert limiter.in_flight == 0
@@ -0,0 +1,137 @@
+import pytest
+
+import sqlite3
+import time
+
+from app.job_queue import FAILED, JobQueue, job_priority
+from app.sheet.enums import ProcessType
+
+
+@pytest.fixture
+def queue(tmp_path) -> JobQueue:
+    return JobQueue(tmp_path / "state.sqlite3", max_attempts=2, lease_timeout=60)
+
+
+def row(check: str, offer_id: str | None = None, **fields) -> dict:
+    return {"Check": check, "Offer_ID": offer_id, **fields}
+
+
+def test_priority_puts_delists_and_creates_first():
+    assert job_priority(row(ProcessType.DELIST.value, "o1")) == 0
+    assert job_priority(row(ProcessType.LIST.value)) == 0
+    assert job_priority(row(ProcessType.EDIT.value, "o1")) == 1
+    assert job_priority(row(ProcessType.LIST.value, "o1")) == 2
+
+
+def test_leases_by_priority_and_only_once(queue):
+    queue.enqueue(
+        "sheet",
+        "Sheet1",
+        [
+            (2, row(ProcessType.LIST.value, "o2")),
+            (3, row(ProcessType.EDIT.value, "o3")),
+            (4, row(ProcessType.DELIST.value, "o4")),
+        ],
+    )
+    assert [job.row_index for job in queue.lease("sheet", "Sheet1")] == [4, 3, 2]
+    assert queue.lease("sheet", "Sheet1") == []
+    assert queue.pending_count() == 0
+
+
+def test_recover_releases_leases_of_a_stopped_run(queue, tmp_path):
+    queue.enqueue("sheet", "Sheet1", [(2, row(ProcessType.EDIT.value, "o2"))])
+    jobs = queue.lease("sheet", "Sheet1")
+
+    restarted = JobQueue(tmp_path / "state.sqlite3", max_attempts=2, lease_timeout=60)
+    assert restarted.recover() == 1
+    assert restarted.lease("sheet", "Sheet1")[0].model_dict == jobs[0].model_dict
+
+
+def test_expired_leases_are_leased_again(tmp_path):
+    queue = JobQueue(tmp_path / "state.sqlite3", max_attempts=2, lease_timeout=-1)
+    queue.enqueue("sheet", "Sheet1", [(2, row(ProcessType.EDIT.value, "o2"))])
+    assert len(queue.lease("sheet", "Sheet1")) == 1
+    assert len(queue.lease("sheet", "Sheet1")) == 1
+
+
+def test_ack_removes_jobs(queue):
+    queue.enqueue("sheet", "Sheet1", [(2, row(ProcessType.EDIT.value, "o2"))])
+    queue.ack(queue.lease("sheet", "Sheet1"))
+    queue.recover()
+    assert queue.lease("sheet", "Sheet1") == []
+
+
+def fail_leased(queue: JobQueue, times: int) -> None:
+    for _ in range(times):
+        (job,) = queue.lease("sheet", "Sheet1")
+        queue.fail(job, "boom")
+
+
+def test_failing_jobs_back_off_after_max_attempts(tmp_path):
+    queue = JobQueue(
+        tmp_path / "state.sqlite3",
+        max_attempts=2,
+        lease_timeout=60,
+        retry_delay=60,
+        max_retry_delay=100,
+    )
+    queue.enqueue("sheet", "Sheet1", [(2, row(ProcessType.EDIT.value, "o2"))])
+    # The first failure runs again next round
+    fail_leased(queue, 1)
+    assert queue.backoff_jobs() == []
+
+    fail_leased(queue, 1)
+    assert queue.lease("sheet", "Sheet1") == []
+    (backoff,) = queue.backoff_jobs()
+    assert backoff["row_index"] == 2
+    assert backoff["last_error"] == "boom"
+    assert 50 < backoff["retry_at"] - time.time() <= 60
+
+    # Doubling, capped at max_retry_delay
+    queue.conn.execute("UPDATE jobs SET retry_at = 0")
+    fail_leased(queue, 1)
+    assert 90 < queue.backoff_jobs()[0]["retry_at"] - time.time() <= 100
+    queue.conn.execute("UPDATE jobs SET retry_at = 0")
+    fail_leased(queue, 1)
+    assert 90 < queue.backoff_jobs()[0]["retry_at"] - time.time() <= 100
+
+
+def test_changed_rows_skip_the_backoff(queue):
+    edit = row(ProcessType.EDIT.value, "o2", price=1)
+    queue.enqueue("sheet", "Sheet1", [(2, edit)])
+    fail_leased(queue, 2)
+
+    # The same row keeps waiting, a changed one runs again
+    queue.enqueue("sheet", "Sheet1", [(2, edit)])
+    assert queue.lease("sheet", "Sheet1") == []
+    queue.enqueue("sheet", "Sheet1", [(2, {**edit, "price": 2})])
+    assert queue.lease("sheet", "Sheet1")[0].attempts == 0
+
+
+def test_jobs_parked_by_older_versions_run_again(tmp_path):
+    file_path = tmp_path / "state.sqlite3"
+    conn = sqlite3.connect(file_path)
+    conn.execute(
+        "CREATE TABLE jobs (sheet_id TEXT NOT NULL, sheet_name TEXT NOT NULL,"
+        " row_index INTEGER NOT NULL, priority INTEGER NOT NULL,"
+        " model_json TEXT NOT NULL, row_hash TEXT NOT NULL, status TEXT NOT NULL,"
+        " attempts INTEGER NOT NULL DEFAULT 0, leased_until REAL, last_error TEXT,"
+        " updated_at REAL NOT NULL, PRIMARY KEY (sheet_id, sheet_name, row_index))"
+    )
+    conn.execute(
+        "INSERT INTO jobs VALUES ('sheet', 'Sheet1', 2, 1, '{}', 'h', ?, 5,"
+        " NULL, 'boom', 0)",
+        (FAILED,),
+    )
+    conn.commit()
+    conn.close()
+
+    queue = JobQueue(file_path, max_attempts=2, lease_timeout=60)
+    (job,) = queue.lease("sheet", "Sheet1")
+    assert job.attempts == 5
+
+
+def test_scan_drops_rows_that_no_longer_run(queue):
+    queue.enqueue("sheet", "Sheet1", [(2, row(ProcessType.EDIT.value, "o2"))])
+    queue.enqueue("sheet", "Sheet1", [])
+    assert queue.pending_count() == 0
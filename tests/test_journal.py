@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+
+import main
+from app.job_queue import JobQueue
+from app.sheet.models import SOffer
+from app.state import StateStore
+
+SHEET_ID = "sheet"
+SHEET_NAME = "Sheet1"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "state.sqlite3"
+
+
+@pytest.fixture
+def state_store(db_path, monkeypatch) -> StateStore:
+    store = StateStore(db_path, revalidate_interval=60)
+    monkeypatch.setattr(main, "state_store", store)
+    return store
+
+
+def journal_create(state_store: StateStore, model_dict: dict, offer_id: str) -> None:
+    s_offer = SOffer.model_validate(model_dict)
+    s_offer.Offer_ID = offer_id
+    state_store.journal(s_offer, "create")
+
+
+def restart(db_path) -> list:
+    queue = JobQueue(db_path, max_attempts=3, lease_timeout=60)
+    queue.recover()
+    jobs = queue.lease(SHEET_ID, SHEET_NAME)
+    main.restore_created_offers(jobs)
+    return jobs
+
+
+@pytest.mark.parametrize("applied", [False, True])
+def test_restart_after_create_does_not_create_again(
+    db_path, state_store, offer_row, applied
+):
+    queue = JobQueue(db_path, max_attempts=3, lease_timeout=60)
+    queue.enqueue(SHEET_ID, SHEET_NAME, [(2, offer_row())])
+    (job,) = queue.lease(SHEET_ID, SHEET_NAME)
+    journal_create(state_store, job.model_dict, "G1")
+    if applied:
+        # Crash after the sheet write, before the job was acknowledged
+        state_store.mark_journal_applied(state_store.last_journal_id())
+
+    (job,) = restart(db_path)
+    assert job.model_dict["Offer_ID"] == "G1"
+
+
+class FakeBuffer:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.cells: dict = {}
+        self.written: dict = {}
+
+    async def add_cells(self, sheet_id, sheet_name, cells) -> None:
+        self.cells.update(cells)
+
+    async def flush(self) -> None:
+        if not self.fail:
+            self.written.update(self.cells)
+            self.cells = {}
+
+    def pending_rows(self) -> int:
+        return len({row for row, _ in self.cells})
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_replay_writes_pending_entries(state_store, monkeypatch, offer_row, fail):
+    buffer = FakeBuffer(fail=fail)
+    monkeypatch.setattr(main, "sheet_write_buffer", buffer)
+    journal_create(state_store, offer_row(), "G1")
+
+    asyncio.run(main.replay_journal())
+    if fail:
+        # Not on the sheet yet, replayed again on the next start
+        assert len(state_store.pending_journal()) == 1
+    else:
+        assert buffer.written[(2, 5)] == "G1"
+        assert state_store.pending_journal() == []
+
+
+def test_offers_created_before_the_snapshot_are_not_reused(
+    db_path, state_store, offer_row
+):
+    journal_create(state_store, offer_row(), "G1")
+    state_store.mark_journal_applied(state_store.last_journal_id())
+    time.sleep(0.01)
+
+    # The Offer_ID was cleared on the sheet afterwards, it asks for a new offer
+    queue = JobQueue(db_path, max_attempts=3, lease_timeout=60)
+    queue.enqueue(SHEET_ID, SHEET_NAME, [(2, offer_row())])
+    (job,) = restart(db_path)
+    assert job.model_dict.get("Offer_ID") is None
+
+
+def test_journal_needs_an_offer_id(state_store, offer_row):
+    with pytest.raises(ValueError):
+        state_store.journal(SOffer.model_validate(offer_row()), "create")
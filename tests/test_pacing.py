@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from app.pacing import PacingScheduler
+from app.worker_pool import WorkerPool
+
+
+def run_paced_chains(
+    chains: list[list[str]],
+    max_concurrency: int,
+    max_concurrency_per_key: int,
+    relax: float,
+) -> dict[str, float]:
+    scheduler = PacingScheduler()
+    pool: WorkerPool[str] = WorkerPool(max_concurrency, max_concurrency_per_key)
+    started_at: dict[str, float] = {}
+
+    async def handler(job: str) -> None:
+        started_at[job] = time.monotonic()
+        await asyncio.sleep(0.01)
+        scheduler.space(job.split(":")[0], relax)
+
+    asyncio.run(
+        pool.run(
+            chains,
+            handler,
+            key_func=lambda job: job.split(":")[0],
+            wait_func=scheduler.wait,
+            due_func=scheduler.is_due,
+        )
+    )
+    return started_at
+
+
+def test_spaces_single_row_chains_on_the_same_key():
+    started_at = run_paced_chains(
+        [["brand:1"], ["brand:2"]],
+        max_concurrency=1,
+        max_concurrency_per_key=0,
+        relax=0.2,
+    )
+    assert abs(started_at["brand:2"] - started_at["brand:1"]) >= 0.2
+
+
+def test_spaces_chains_limited_per_key():
+    started_at = run_paced_chains(
+        [["brand:1"], ["brand:2"]],
+        max_concurrency=4,
+        max_concurrency_per_key=1,
+        relax=0.2,
+    )
+    assert abs(started_at["brand:2"] - started_at["brand:1"]) >= 0.2
+
+
+def test_other_keys_are_not_held():
+    started_at = run_paced_chains(
+        [["a:1", "a:2"], ["b:1"]],
+        max_concurrency=2,
+        max_concurrency_per_key=1,
+        relax=0.3,
+    )
+    assert started_at["b:1"] - started_at["a:1"] < 0.1
+    assert started_at["a:2"] - started_at["a:1"] >= 0.3
+
+
+def test_paced_rows_give_the_only_slot_to_other_keys():
+    started_at = run_paced_chains(
+        [["a:1"], ["a:2"], ["a:3"], ["b:1"]],
+        max_concurrency=1,
+        max_concurrency_per_key=0,
+        relax=0.2,
+    )
+    assert started_at["b:1"] - min(started_at.values()) < 0.1
+    a_starts = sorted(started_at[f"a:{i}"] for i in range(1, 4))
+    assert a_starts[1] - a_starts[0] >= 0.2
+    assert a_starts[2] - a_starts[1] >= 0.2
+
+
+def test_start_round_keeps_the_interval():
+    scheduler = PacingScheduler()
+
+    async def rounds() -> float:
+        await scheduler.start_round(0.2)
+        started_at = time.monotonic()
+        await scheduler.start_round(0.2)
+        return time.monotonic() - started_at
+
+    assert asyncio.run(rounds()) >= 0.19
+    assert scheduler.round_stats()["round_wait"] > 0
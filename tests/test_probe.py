@@ -0,0 +1,96 @@
+import asyncio
+
+from app.sheet.probe import DriveState, SheetChangeProbe
+
+SHEET_ID = "sheet"
+SHEET_NAME = "Sheet1"
+
+
+class FakeProbe(SheetChangeProbe):
+    def __init__(self, min_interval: float = 0) -> None:
+        super().__init__(
+            min_interval=min_interval, max_interval=60, full_round_interval=3600
+        )
+        self.modified_time = "t0"
+        self.modified_by_me = False
+        self.rows: list[tuple[int, dict]] = [(2, {"Check": "LIST", "price": 1})]
+        self.row_reads = 0
+
+    def drive_state(self, sheet_id: str) -> DriveState | None:
+        return DriveState(
+            modified_time=self.modified_time, modified_by_me=self.modified_by_me
+        )
+
+    def run_snapshot(self, sheet_id: str, sheet_name: str) -> list[tuple[int, dict]]:
+        self.row_reads += 1
+        return [(index, dict(model_dict)) for index, model_dict in self.rows]
+
+    def edit(self, price: int, by_me: bool = False) -> None:
+        self.rows = [(2, {**self.rows[0][1], "price": price})]
+        self.touch(by_me)
+
+    def touch(self, by_me: bool) -> None:
+        self.modified_time = f"{self.modified_time}+"
+        self.modified_by_me = by_me
+
+    def round(self, during_round=None) -> None:
+        asyncio.run(self.read_snapshot(SHEET_ID, SHEET_NAME))
+        if during_round is not None:
+            during_round()
+        self.commit(SHEET_ID)
+
+    def changed(self) -> bool:
+        return asyncio.run(self.has_changed(SHEET_ID, SHEET_NAME))
+
+
+def test_unchanged_sheet_skips_rounds():
+    probe = FakeProbe()
+    assert probe.changed()
+    probe.round()
+    assert not probe.changed()
+
+
+def test_edit_by_someone_else_runs_a_round():
+    probe = FakeProbe()
+    probe.round()
+    probe.edit(price=2)
+    assert probe.changed()
+
+
+def test_our_own_writes_alone_do_not_run_a_round():
+    probe = FakeProbe()
+    probe.round(during_round=lambda: probe.touch(by_me=True))
+    assert not probe.changed()
+    # The rows were compared once, then our writes are in the baseline
+    assert not probe.changed()
+    assert probe.row_reads == 2
+
+
+def test_edit_during_the_round_is_not_hidden_by_our_writes():
+    probe = FakeProbe()
+
+    def user_edit_then_our_flush() -> None:
+        probe.edit(price=2)
+        probe.touch(by_me=True)
+
+    probe.round(during_round=user_edit_then_our_flush)
+    assert probe.changed()
+
+
+def test_rerun_keeps_the_next_round_full():
+    probe = FakeProbe()
+    asyncio.run(probe.read_snapshot(SHEET_ID, SHEET_NAME))
+    probe.commit(SHEET_ID, rerun=True)
+    assert probe.changed()
+
+
+def test_idle_interval_grows_from_zero():
+    probe = FakeProbe(min_interval=0)
+    probe.round()
+    intervals = []
+    for _ in range(3):
+        assert not probe.changed()
+        intervals.append(probe.interval)
+    assert intervals == [2, 4, 8]
+    probe.round()
+    assert probe.interval == 0
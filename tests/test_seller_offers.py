@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+
+from app.g2g.crwl_api import AsyncCrwlG2GAPI
+
+
+def fake_g2g(pages: dict[int, list[str]], ignore_page: bool = False):
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        page = 1 if ignore_page else int(request.url.params["page"])
+        return httpx.Response(
+            200,
+            json={
+                "code": 2000,
+                "messages": [],
+                "request_id": "test",
+                "payload": {
+                    "results": [
+                        {"offer_id": offer_id, "status": "live"}
+                        for offer_id in pages.get(page, [])
+                    ]
+                },
+            },
+        )
+
+    client = AsyncCrwlG2GAPI(
+        base_url="https://g2g.test",
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    return client, requests
+
+
+def all_offer_ids(client: AsyncCrwlG2GAPI, **kwargs) -> list[str]:
+    offers = asyncio.run(
+        client.get_all_seller_offers(seller_id="seller", token="token", **kwargs)
+    )
+    return [offer.offer_id for offer in offers]
+
+
+def test_reads_pages_until_a_short_one():
+    client, requests = fake_g2g({1: ["a", "b"], 2: ["c", "d"], 3: ["e"]})
+    assert all_offer_ids(client, page_size=2) == ["a", "b", "c", "d", "e"]
+    assert len(requests) == 3
+    assert requests[0].url.path == "/offer/search"
+    assert requests[0].url.params["seller_id"] == "seller"
+    assert requests[0].headers["authorization"] == "token"
+
+
+def test_stops_on_an_empty_page():
+    client, requests = fake_g2g({1: ["a", "b"]})
+    assert all_offer_ids(client, page_size=2) == ["a", "b"]
+    assert len(requests) == 2
+
+
+def test_stops_when_the_server_ignores_the_page():
+    client, requests = fake_g2g({1: ["a", "b"]}, ignore_page=True)
+    assert all_offer_ids(client, page_size=2) == ["a", "b"]
+    assert len(requests) == 2
+
+
+def test_stops_at_the_page_limit():
+    client, requests = fake_g2g(
+        {page: [f"{page}-a", f"{page}-b"] for page in range(1, 10)}
+    )
+    assert len(all_offer_ids(client, page_size=2, max_pages=3)) == 6
+    assert len(requests) == 3
@@ -0,0 +1,33 @@
+from app.sheet.utils import merge_cell_updates
+
+
+def ranges(cells: dict) -> dict[str, list[list]]:
+    return {update["range"]: update["values"] for update in merge_cell_updates(cells)}
+
+
+def test_merges_adjacent_cells_of_a_row():
+    assert ranges({(2, 3): "a", (2, 4): "b", (2, 5): "c"}) == {
+        "C2:E2": [["a", "b", "c"]]
+    }
+
+
+def test_stacks_same_columns_of_consecutive_rows():
+    cells = {(2, 3): "a", (2, 4): "b", (3, 3): "c", (3, 4): "d"}
+    assert ranges(cells) == {"C2:D3": [["a", "b"], ["c", "d"]]}
+
+
+def test_keeps_gaps_as_separate_ranges():
+    cells = {(2, 3): "a", (2, 5): "b", (4, 3): "c"}
+    assert ranges(cells) == {"C2": [["a"]], "E2": [["b"]], "C4": [["c"]]}
+
+
+def test_rows_with_different_columns_are_not_stacked():
+    cells = {(2, 3): "a", (2, 4): "b", (3, 3): "c"}
+    assert ranges(cells) == {"C2:D2": [["a", "b"]], "C3": [["c"]]}
+
+
+def test_every_cell_is_written_once():
+    cells = {(row, col): f"{row}/{col}" for row in (2, 3, 5) for col in (1, 2, 4)}
+    updates = merge_cell_updates(cells)
+    assert len(updates) == 4
+    assert sum(len(row) for update in updates for row in update["values"]) == len(cells)
@@ -0,0 +1,36 @@
+import time
+
+from app.sheet.rate_limit import SheetsRateLimiter, TokenBucket
+
+
+def test_serves_the_burst_without_waiting():
+    bucket = TokenBucket(rate_per_minute=60, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.usage()["used_last_minute"] == 3
+
+
+def test_waits_for_a_refill_once_empty():
+    # 1200 per minute is one token every 0.05 seconds
+    bucket = TokenBucket(rate_per_minute=1200, capacity=1)
+    bucket.acquire()
+    started_at = time.monotonic()
+    waited = bucket.acquire()
+    assert waited > 0
+    assert time.monotonic() - started_at >= 0.04
+    assert bucket.usage()["total_wait"] >= 0.04
+
+
+def test_refill_is_capped_at_capacity():
+    bucket = TokenBucket(rate_per_minute=6000, capacity=2)
+    time.sleep(0.05)
+    assert bucket.usage()["available"] == 2
+
+
+def test_reads_and_writes_use_separate_budgets():
+    limiter = SheetsRateLimiter(read_per_minute=6000, write_per_minute=60, burst=1)
+    limiter.acquire("GET", "spreadsheets/key/values/A1")
+    limiter.acquire("POST", "spreadsheets/key/values:batchGet")
+    limiter.acquire("POST", "spreadsheets/key/values:batchUpdate")
+    usage = limiter.usage()
+    assert usage["read"]["used_last_minute"] == 2
+    assert usage["write"]["used_last_minute"] == 1
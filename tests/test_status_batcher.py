@@ -0,0 +1,132 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Callable
+
+import pytest
+
+from app import status_batcher as status_batcher_module
+from app.brw.token import TokenManager
+from app.brw.token_provider import StubTokenProvider
+from app.g2g.enums import OfferStatus
+from app.sheet.enums import ProcessType
+from app.sheet.models import SOffer
+from app.state import StateStore
+from app.status_batcher import StatusBatcher
+
+
+class FakeG2G:
+    def __init__(self) -> None:
+        self.updates: list[tuple[list[str], str]] = []
+        self.fail = False
+
+    async def bulk_update(self, offer_ids, status, token, user_id):
+        self.updates.append((offer_ids, status))
+        if self.fail:
+            raise RuntimeError("G2G down")
+        return SimpleNamespace(payload=SimpleNamespace(fail=0))
+
+
+class FakeBuffer:
+    def __init__(self) -> None:
+        self.rows: list[SOffer] = []
+
+    async def add(self, s_offer: SOffer) -> None:
+        self.rows.append(s_offer)
+
+
+class NoTokenManager:
+    async def get_token(self) -> str:
+        raise RuntimeError("no token")
+
+
+@pytest.fixture
+def fakes(tmp_path, monkeypatch) -> tuple[FakeG2G, FakeBuffer]:
+    g2g, buffer = FakeG2G(), FakeBuffer()
+    monkeypatch.setattr(status_batcher_module, "async_crwl_g2g_api_client", g2g)
+    monkeypatch.setattr(status_batcher_module, "sheet_write_buffer", buffer)
+    monkeypatch.setattr(
+        status_batcher_module,
+        "state_store",
+        StateStore(tmp_path / "state.sqlite3", revalidate_interval=60),
+    )
+    return g2g, buffer
+
+
+@pytest.fixture
+def s_offer(offer_row) -> Callable[[int, str | None, str], SOffer]:
+    def make(index: int, offer_id: str | None, check: str) -> SOffer:
+        return SOffer.model_validate(offer_row(index, Offer_ID=offer_id, Check=check))
+
+    return make
+
+
+def token_manager() -> TokenManager:
+    return TokenManager([StubTokenProvider(sub="seller")], refresh_margin=60)
+
+
+def test_sends_offers_in_chunks_per_status(fakes, s_offer):
+    g2g, buffer = fakes
+    batcher = StatusBatcher(chunk_size=2)
+    for index, offer_id in enumerate(["a", "b", "c"], start=2):
+        batcher.add(s_offer(index, offer_id, ProcessType.LIST.value), OfferStatus.LIVE)
+    batcher.add(s_offer(5, "d", ProcessType.DELIST.value), OfferStatus.DELISTED)
+
+    assert asyncio.run(batcher.flush(token_manager())) == {}
+    assert g2g.updates == [
+        (["a", "b"], OfferStatus.LIVE.value),
+        (["c"], OfferStatus.LIVE.value),
+        (["d"], OfferStatus.DELISTED.value),
+    ]
+    assert len(buffer.rows) == 4
+    assert batcher.pending == {}
+
+
+def test_rows_of_one_offer_get_their_own_message(fakes, s_offer):
+    g2g, buffer = fakes
+    batcher = StatusBatcher(chunk_size=10)
+    batcher.add(s_offer(2, "a", ProcessType.LIST.value), OfferStatus.LIVE)
+    batcher.add(s_offer(3, "a", ProcessType.DELIST.value), OfferStatus.DELISTED)
+
+    failed_rows = asyncio.run(batcher.flush(token_manager()))
+    assert g2g.updates == [(["a"], OfferStatus.DELISTED.value)]
+    assert list(failed_rows) == [2]
+    notes = {row.index: row.Note for row in buffer.rows}
+    assert "FAILED" in notes[2] and "row 3" in notes[2]
+    assert "delist" in notes[3]
+
+
+def test_returns_rows_of_failed_updates(fakes, s_offer):
+    g2g, buffer = fakes
+    g2g.fail = True
+    batcher = StatusBatcher(chunk_size=10)
+    batcher.add(s_offer(2, "a", ProcessType.LIST.value), OfferStatus.LIVE)
+    batcher.add(s_offer(3, "b", ProcessType.LIST.value), OfferStatus.LIVE)
+
+    assert asyncio.run(batcher.flush(token_manager())) == {
+        2: "G2G down",
+        3: "G2G down",
+    }
+    assert all("FAILED" in (row.Note or "") for row in buffer.rows)
+
+
+def test_keeps_rows_pending_without_a_token(fakes, s_offer):
+    g2g, buffer = fakes
+    batcher = StatusBatcher(chunk_size=10)
+    batcher.add(s_offer(2, "a", ProcessType.LIST.value), OfferStatus.LIVE)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(batcher.flush(NoTokenManager()))
+    assert g2g.updates == []
+    assert list(batcher.pending) == ["a"]
+
+    # A rerun of the row replaces it instead of adding it twice
+    batcher.add(s_offer(2, "a", ProcessType.LIST.value), OfferStatus.LIVE)
+    asyncio.run(batcher.flush(token_manager()))
+    assert len(buffer.rows) == 1
+
+
+def test_rows_without_an_offer_are_rejected(s_offer):
+    with pytest.raises(ValueError):
+        StatusBatcher(chunk_size=10).add(
+            s_offer(2, None, ProcessType.LIST.value), OfferStatus.LIVE
+        )
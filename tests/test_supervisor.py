@@ -0,0 +1,9 @@
+from supervisor import Shard, ShardWorker
+
+
+def test_shards_do_not_inherit_the_access_token(monkeypatch):
+    monkeypatch.setenv("G2G_ACCESS_TOKEN", "shared")
+    shard = Shard(name="acc1", SPREADSHEET_KEY="key", SHEET_NAME="Sheet1")
+    env = ShardWorker(shard, shard_count=2).env()
+    assert env["G2G_ACCESS_TOKEN"] == ""
+    assert env["STATE_DB_FILE"] == "cache/acc1/state.sqlite3"
@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+from app.brw.token import TokenManager
+from app.brw.token_provider import FileTokenProvider, StubTokenProvider
+from app.brw.utils import decode_jwt
+
+
+def test_stub_token_decodes_to_the_account():
+    token = asyncio.run(StubTokenProvider(sub="acc-1", ttl=60).get_token(0))
+    payload = decode_jwt(token)
+    assert payload.sub == "acc-1"
+    assert payload.exp >= time.time() + 59
+
+
+def test_stub_token_is_valid_as_long_as_asked():
+    valid_until = time.time() + 3600
+    token = asyncio.run(StubTokenProvider(sub="acc-1", ttl=60).get_token(valid_until))
+    assert decode_jwt(token).exp > valid_until
+
+
+def test_token_manager_uses_the_stub():
+    manager = TokenManager([StubTokenProvider(sub="acc-1")], refresh_margin=60)
+    assert asyncio.run(manager.get_payload()).sub == "acc-1"
+    assert manager.seconds_to_expiry() > 60
+
+
+def test_file_provider_skips_expired_tokens(tmp_path):
+    expired = asyncio.run(StubTokenProvider(sub="old", ttl=-60).get_token(0))
+    fresh = asyncio.run(StubTokenProvider(sub="new", ttl=3600).get_token(0))
+    file_path = tmp_path / "token.jwt"
+    provider = FileTokenProvider(file_path, env_token=expired)
+    assert asyncio.run(provider.get_token(time.time())) is None
+
+    provider.save(fresh)
+    assert asyncio.run(provider.get_token(time.time())) == fresh
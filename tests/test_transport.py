@@ -0,0 +1,45 @@
+import asyncio
+
+import httpx
+
+from app.g2g.transport import TransportSettings, build_async_client
+
+
+def build(max_connections: int, host_max_connections: dict[str, int]):
+    return build_async_client(
+        TransportSettings(
+            http2=False,
+            max_connections=max_connections,
+            max_keepalive_connections=10,
+            keepalive_expiry=60,
+            host_max_connections=host_max_connections,
+            connect_timeout=5,
+            read_timeout=10,
+        )
+    )
+
+
+def pool_size(client: httpx.AsyncClient, url: str) -> int:
+    transport = client._transport_for_url(httpx.URL(url))
+    return transport._pool._max_connections  # type: ignore[attr-defined]
+
+
+def test_each_host_uses_its_own_pool():
+    client = build(20, {"https://sls.g2g.com": 10, "https://assets.g2g.com": 2})
+    api = client._transport_for_url(httpx.URL("https://sls.g2g.com/offer"))
+    assets = client._transport_for_url(httpx.URL("https://assets.g2g.com/a.json"))
+    other = client._transport_for_url(httpx.URL("https://example.com/"))
+    assert len({id(api), id(assets), id(other)}) == 3
+    assert pool_size(client, "https://sls.g2g.com/offer") == 10
+    assert pool_size(client, "https://assets.g2g.com/a.json") == 2
+    # The rest of the overall cap
+    assert pool_size(client, "https://example.com/") == 8
+    asyncio.run(client.aclose())
+
+
+def test_host_pools_stay_within_the_overall_cap():
+    client = build(6, {"https://sls.g2g.com": 10, "https://assets.g2g.com": 2})
+    assert pool_size(client, "https://sls.g2g.com/offer") == 6
+    assert pool_size(client, "https://assets.g2g.com/a.json") == 1
+    assert pool_size(client, "https://example.com/") == 1
+    asyncio.run(client.aclose())
@@ -0,0 +1,54 @@
+import asyncio
+
+from app.worker_pool import WorkerPool
+
+
+def run_pool(
+    chains: list[list[str]],
+    max_concurrency: int,
+    max_concurrency_per_key: int = 0,
+) -> tuple[list[str], int, dict[str, int]]:
+    pool: WorkerPool[str] = WorkerPool(max_concurrency, max_concurrency_per_key)
+    order: list[str] = []
+    running: dict[str, int] = {}
+    peak = 0
+    peak_per_key: dict[str, int] = {}
+
+    async def handler(job: str) -> None:
+        nonlocal peak
+        key = job.split(":")[0]
+        running[key] = running.get(key, 0) + 1
+        peak = max(peak, sum(running.values()))
+        peak_per_key[key] = max(peak_per_key.get(key, 0), running[key])
+        await asyncio.sleep(0.01)
+        order.append(job)
+        running[key] -= 1
+
+    asyncio.run(pool.run(chains, handler, key_func=lambda job: job.split(":")[0]))
+    return order, peak, peak_per_key
+
+
+def test_runs_every_job_within_the_global_limit():
+    chains = [[f"{key}:{i}"] for key in "abcdef" for i in range(2)]
+    order, peak, _ = run_pool(chains, max_concurrency=3)
+    assert sorted(order) == sorted(job for chain in chains for job in chain)
+    assert peak == 3
+
+
+def test_keeps_order_inside_a_chain():
+    order, _, _ = run_pool([["a:1", "a:2", "a:3"], ["b:1", "b:2"]], 4)
+    assert [job for job in order if job.startswith("a")] == ["a:1", "a:2", "a:3"]
+    assert [job for job in order if job.startswith("b")] == ["b:1", "b:2"]
+
+
+def test_limits_concurrency_per_key():
+    chains = [["a:1"], ["a:2"], ["a:3"], ["b:1"], ["b:2"]]
+    _, peak, peak_per_key = run_pool(chains, 4, max_concurrency_per_key=1)
+    assert peak_per_key == {"a": 1, "b": 1}
+    assert peak == 2
+
+
+def test_zero_concurrency_still_runs():
+    order, peak, _ = run_pool([["a:1"], ["b:1"]], max_concurrency=0)
+    assert len(order) == 2
+    assert peak == 1